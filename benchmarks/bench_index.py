@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+# Задержка поиска и recall@k бэкендов VectorIndex относительно точного IndexFlatIP.
+# Запуск из корня проекта: python benchmarks/bench_index.py --sizes 10000 100000 1000000
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_index import BACKENDS, VectorIndex, normalize_rows  # noqa: E402
+
+
+def make_corpus(size: int, dimension: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    # новости кучкуются вокруг событий, поэтому берём смесь кластеров, а не равномерный шум
+    centers = normalize_rows(rng.standard_normal((topics, dimension), dtype='float32'))
+    labels = rng.integers(0, topics, size)
+    noise = rng.standard_normal((size, dimension), dtype='float32') * 0.04
+    return normalize_rows(centers[labels] + noise)
+
+
+def make_queries(corpus: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    # запросы — слегка переписанные уже сохранённые статьи
+    picked = corpus[rng.integers(0, len(corpus), count)]
+    return normalize_rows(picked + rng.standard_normal(picked.shape, dtype='float32') * 0.02)
+
+
+def run(size: int, args: argparse.Namespace, logger: logging.Logger) -> None:
+    rng = np.random.default_rng(args.seed)
+    corpus = make_corpus(size, args.dimension, max(size // 50, 10), rng)
+    queries = make_queries(corpus, args.queries, rng)
+
+    exact_positions: np.ndarray | None = None
+    # flat идёт первым в BACKENDS и служит эталоном для recall
+    for backend in BACKENDS:
+        if backend not in args.backends:
+            continue
+        index = VectorIndex(
+            logger,
+            args.dimension,
+            backend=backend,
+            hnsw_m=args.hnsw_m,
+            hnsw_ef_search=args.hnsw_ef_search,
+            # по умолчанию nlist ~ sqrt(N), чтобы IVF успел обучиться и на 10k
+            ivf_nlist=args.ivf_nlist or max(int(np.sqrt(size)), 16),
+            ivf_nprobe=args.ivf_nprobe,
+        )
+        started = time.perf_counter()
+        index.build(corpus)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        positions = np.empty((len(queries), args.k), dtype='int64')
+        for row, query in enumerate(queries):
+            started = time.perf_counter()
+            _, found = index.search(query, args.k)
+            latencies.append(time.perf_counter() - started)
+            positions[row] = found[0]
+
+        if backend == 'flat':
+            exact_positions = positions
+        recall = None
+        if exact_positions is not None:
+            hits = sum(len(set(found) & set(exact)) for found, exact in zip(positions, exact_positions))
+            recall = hits / exact_positions.size
+
+        latencies_ms = np.array(latencies) * 1000
+        print(
+            f'{size:>9} {index.kind:>5} build={build_seconds:8.2f}s '
+            f'p50={np.percentile(latencies_ms, 50):7.3f}ms p95={np.percentile(latencies_ms, 95):7.3f}ms '
+            f'recall@{args.k}={recall if recall is None else round(recall, 4)}'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--hnsw-ef-search', type=int, default=64)
+    parser.add_argument('--ivf-nlist', type=int, default=None)
+    parser.add_argument('--ivf-nprobe', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logger = logging.getLogger('bench_index')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    for size in args.sizes:
+        run(size, args, logger)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+# Проверка дублей через LLM: попарные запросы против одного запроса со списком кандидатов.
+# Модель заменена локальной заглушкой с искусственной задержкой; кандидат считается дублем,
+# если в нём есть метка ДУБЛЬ. Токены оцениваются грубо как символы / 4.
+# Запуск из корня проекта: python benchmarks/bench_llm.py --articles 50 --candidates 10
+
+import argparse
+import asyncio
+import logging
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dedup import EMBEDDING_DIMENSION, DuplicateDetector  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from vector_index import VectorIndex  # noqa: E402
+
+MARKER = 'ДУБЛЬ'
+_NUMBERED_RE = re.compile(r'^(\d+)\. (.*)$', re.MULTILINE)
+
+
+class StubStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.prompt_chars = 0
+
+
+def make_app(stats: StubStats, latency: float) -> web.Application:
+    async def completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        prompt = payload['messages'][0]['content']
+        stats.requests += 1
+        stats.prompt_chars += len(prompt)
+        await asyncio.sleep(latency)
+        if 'Кандидаты:' in prompt:
+            numbers = [number for number, text in _NUMBERED_RE.findall(prompt.split('Кандидаты:', 1)[1]) if MARKER in text]
+            answer = ', '.join(numbers) or 'Нет'
+        else:
+            answer = 'Да' if MARKER in prompt.split('Текст 2:', 1)[1] else 'Нет'
+        return web.json_response({'choices': [{'message': {'content': answer}}]})
+
+    app = web.Application()
+    app.router.add_post('/chat/completions', completions)
+    return app
+
+
+def make_workload(articles: int, candidates: int, duplicate_rate: float) -> list[tuple[str, list[tuple[str, str]]]]:
+    rng = random.Random(0)
+    lead = 'Автопроизводитель представил обновлённую модель кроссовера с новым двигателем и салоном. ' * 4
+    workload = []
+    for article in range(articles):
+        pool = [(f'https://example.com/{article}/{number}', f'Кандидат {number}. {lead}') for number in range(candidates)]
+        if rng.random() < duplicate_rate:
+            position = rng.randrange(candidates)
+            link, text = pool[position]
+            pool[position] = (link, f'{MARKER} {text}')
+        workload.append((f'Новая статья {article}. {lead}', pool))
+    return workload
+
+
+async def run_mode(
+    logger: logging.Logger,
+    port: int,
+    batch_verify: bool,
+    workload: list[tuple[str, list[tuple[str, str]]]],
+) -> tuple[float, int]:
+    client = LLMClient(logger, 'stub', base_url=f'http://127.0.0.1:{port}', max_concurrency=8, max_connections=8)
+    await client.start()
+    detector = DuplicateDetector(
+        logger,
+        None,
+        VectorIndex(logger, EMBEDDING_DIMENSION),
+        lambda ids: {},
+        client,
+        llm_batch_verify=batch_verify,
+    )
+    started = time.perf_counter()
+    try:
+        if batch_verify:
+            results = await asyncio.gather(
+                *(detector.llm_match_candidates(text, pool, 'bench_compare') for text, pool in workload)
+            )
+        else:
+            results = await asyncio.gather(
+                *(detector.llm_first_match(text, pool, 'bench_compare') for text, pool in workload)
+            )
+    finally:
+        await client.close()
+    return time.perf_counter() - started, sum(matched_link is not None for matched_link, _ in results)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    logger = logging.getLogger('bench_llm')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    workload = make_workload(args.articles, args.candidates, args.duplicate_rate)
+
+    for label, batch_verify in (('pairwise', False), ('batched', True)):
+        stats = StubStats()
+        runner = web.AppRunner(make_app(stats, args.latency))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', args.port)
+        await site.start()
+        try:
+            seconds, duplicates = await run_mode(logger, args.port, batch_verify, workload)
+        finally:
+            await runner.cleanup()
+        print(
+            f'{label:>8} articles={args.articles} candidates={args.candidates} requests={stats.requests:>5} '
+            f'prompt_tokens~{stats.prompt_chars // 4:>8} duplicates={duplicates:>4} seconds={seconds:7.2f}'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articles', type=int, default=50)
+    parser.add_argument('--candidates', type=int, default=10)
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.3, help='задержка ответа заглушки, секунд')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+# RSS процесса после построения индекса дедупликации в зависимости от размера истории:
+# прежняя схема (load_all + (link, text) на каждую статью) против id-only индекса,
+# и отдельно лексический индекс MinHash по тем же текстам.
+# Запуск из корня проекта: python benchmarks/bench_memory.py --sizes 10000 50000 100000
+
+import argparse
+import logging
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lexical import MinHashIndex  # noqa: E402
+from storage import PublishedStorage  # noqa: E402
+from vector_index import VectorIndex, normalize_rows  # noqa: E402
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm', encoding='ascii') as fh:
+        resident_pages = int(fh.read().split()[1])
+    return resident_pages * 4096 / 1024 / 1024
+
+
+def fill(db_path: Path, rows: int, dimension: int) -> None:
+    storage = PublishedStorage(db_path)
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, 1000):
+        storage.add_articles(
+            [
+                {
+                    'link': f'https://example.com/news/{row_id}',
+                    'title': f'заголовок {row_id}',
+                    'lead': 'лид новости ' * 20,
+                    'text': f'заголовок {row_id} ' + 'лид новости ' * 20,
+                    'embedding': rng.standard_normal(dimension).astype(np.float32),
+                    'source': 'example.com',
+                    'is_duplicate': False,
+                }
+                for row_id in range(start, min(start + 1000, rows))
+            ]
+        )
+    storage.close()
+
+
+def measure(mode: str, db_path: Path, dimension: int) -> None:
+    # выполняется в отдельном процессе, чтобы замеры не влияли друг на друга
+    logger = logging.getLogger('bench_memory')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    baseline = rss_mb()
+    storage = PublishedStorage(db_path)
+    index = VectorIndex(logger, dimension)
+    if mode == 'legacy':
+        published = storage.load_all()
+        texts = [(item['link'], item['text']) for item in published]
+        index.build(normalize_rows([item['embedding'] for item in published]))
+        del published
+        kept = len(texts)
+    elif mode == 'minhash':
+        lexical = MinHashIndex(logger)
+        lexical.add_texts(storage.iter_texts())
+        kept = len(lexical)
+    else:
+        row_ids, embeddings = storage.load_embeddings()
+        index.build(normalize_rows(embeddings))
+        del embeddings
+        kept = len(row_ids)
+    print(f'{mode:>7} rows={kept:>8} rss_delta={rss_mb() - baseline:9.1f}MB')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 100_000])
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--measure', choices=('legacy', 'ids', 'minhash'))
+    parser.add_argument('--db', type=Path)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.db, args.dimension)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = Path(tmp) / f'{size}.db'
+            fill(db_path, size, args.dimension)
+            for mode in ('legacy', 'ids', 'minhash'):
+                subprocess.run(
+                    [sys.executable, __file__, '--measure', mode, '--db', str(db_path), '--dimension', str(args.dimension)],
+                    check=True,
+                )
+
+
+if __name__ == '__main__':
+    main()
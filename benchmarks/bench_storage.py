@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+# Размер базы и время load_all для эмбеддингов в JSON (старый формат), float32 и float16.
+# Запуск из корня проекта: python benchmarks/bench_storage.py --rows 20000
+
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import PublishedStorage  # noqa: E402
+
+
+def fill_legacy(storage: PublishedStorage, rows: int, dimension: int, rng: np.random.Generator) -> None:
+    # пишем так, как писала прежняя версия: json.dumps(list[float]) в колонку embedding
+    with sqlite3.connect(storage.db_path) as conn:
+        for start in range(0, rows, 1000):
+            batch = []
+            for row_id in range(start, min(start + 1000, rows)):
+                vector = rng.standard_normal(dimension).astype(np.float32).tolist()
+                batch.append((
+                    f'https://example.com/news/{row_id}',
+                    f'заголовок {row_id}',
+                    'лид новости ' * 20,
+                    f'заголовок {row_id} ' + 'лид новости ' * 20,
+                    json.dumps(vector, ensure_ascii=False),
+                    'example.com',
+                ))
+            conn.executemany(
+                '''
+                INSERT INTO published_articles (link, title, lead, text, embedding, source)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                batch,
+            )
+        conn.commit()
+
+
+def measure(label: str, storage: PublishedStorage) -> None:
+    storage.vacuum()
+    size_mb = storage.db_path.stat().st_size / 1024 / 1024
+    started = time.perf_counter()
+    rows = storage.load_all()
+    load_seconds = time.perf_counter() - started
+    print(f'{label:>8} rows={len(rows):>8} size={size_mb:9.1f}MB load_all={load_seconds:7.2f}s')
+
+
+def migrate(storage: PublishedStorage) -> float:
+    started = time.perf_counter()
+    while storage.migrate_embeddings(batch_size=2000):
+        pass
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ('float32', 'float16'):
+            rng = np.random.default_rng(args.seed)
+            storage = PublishedStorage(Path(tmp) / f'{dtype}.db', embedding_dtype=dtype)
+            fill_legacy(storage, args.rows, args.dimension, rng)
+            if dtype == 'float32':
+                measure('json', storage)
+            migrate_seconds = migrate(storage)
+            print(f'{dtype:>8} migration={migrate_seconds:7.2f}s')
+            measure(dtype, storage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+# Пропускная способность записи: прежняя схема (новое соединение и commit на каждую статью,
+# rollback journal) против add_article на общем WAL-соединении и add_articles пачкой за цикл.
+# Запуск из корня проекта: python benchmarks/bench_writes.py --rows 2000 --cycle 40
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import PublishedStorage, encode_embedding  # noqa: E402
+
+
+def make_articles(rows: int, dimension: int, offset: int, rng: np.random.Generator) -> list[dict[str, Any]]:
+    return [
+        {
+            'link': f'https://example.com/news/{offset + row_id}',
+            'title': f'заголовок {row_id}',
+            'lead': 'лид новости ' * 20,
+            'text': f'заголовок {row_id} ' + 'лид новости ' * 20,
+            'embedding': rng.standard_normal(dimension).astype(np.float32),
+            'source': 'example.com',
+            'is_duplicate': bool(row_id % 3 == 0),
+        }
+        for row_id in range(rows)
+    ]
+
+
+def write_legacy(storage: PublishedStorage, articles: list[dict[str, Any]]) -> None:
+    # как до пула: connect на каждый вызов, журнал по умолчанию, commit на каждую строку
+    for article in articles:
+        conn = sqlite3.connect(storage.db_path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.execute(
+            '''
+            INSERT OR IGNORE INTO published_articles (
+                link, title, lead, text, embedding_blob, embedding_format, embedding_dim, source, is_duplicate
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (
+                article['link'],
+                article['title'],
+                article['lead'],
+                article['text'],
+                encode_embedding(article['embedding'], storage.embedding_format),
+                storage.embedding_format,
+                len(article['embedding']),
+                article['source'],
+                int(article['is_duplicate']),
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+
+def write_single(storage: PublishedStorage, articles: list[dict[str, Any]]) -> None:
+    for article in articles:
+        storage.add_article(**article)
+
+
+def write_batched(storage: PublishedStorage, articles: list[dict[str, Any]], cycle: int) -> None:
+    for start in range(0, len(articles), cycle):
+        storage.add_articles(articles[start:start + cycle])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--cycle', type=int, default=40, help='статей за один цикл сбора')
+    parser.add_argument('--dimension', type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ('legacy', 'single', 'batched'):
+            storage = PublishedStorage(Path(tmp) / f'{label}.db')
+            articles = make_articles(args.rows, args.dimension, 0, rng)
+            if label == 'legacy':
+                # пул уже перевёл базу в WAL, для честного сравнения закрываем его
+                storage.close()
+            started = time.perf_counter()
+            if label == 'legacy':
+                write_legacy(storage, articles)
+            elif label == 'single':
+                write_single(storage, articles)
+            else:
+                write_batched(storage, articles, args.cycle)
+            seconds = time.perf_counter() - started
+            storage.close()
+            print(f'{label:>8} rows={args.rows} seconds={seconds:7.2f} rows_per_second={args.rows / seconds:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Response, Route
+
+from logging_utils import json_log
+
+DEFAULT_BLOCKED_TYPES = frozenset({'image', 'media', 'font'})
+
+TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'mc.yandex.ru',
+    'an.yandex.ru',
+    'adfox.ru',
+    'adriver.ru',
+    'top-fwz1.mail.ru',
+    'mediametrics.ru',
+    'liveinternet.ru',
+    'facebook.net',
+    'vk.com',
+    'criteo.com',
+    'relap.io',
+    'smi2.ru',
+)
+
+# оценка размера ответа, пока для типа не набрана статистика по content-length
+FALLBACK_SIZE_BYTES = {
+    'image': 60_000,
+    'media': 500_000,
+    'font': 40_000,
+    'script': 80_000,
+    'stylesheet': 30_000,
+}
+
+
+def _host_matches(host: str, domains: tuple[str, ...]) -> bool:
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+@dataclass(frozen=True, slots=True)
+class BlockingRules:
+    first_party_domains: tuple[str, ...] = ()
+    blocked_types: frozenset[str] = DEFAULT_BLOCKED_TYPES
+    blocked_domains: tuple[str, ...] = TRACKER_DOMAINS
+    block_third_party: bool = False
+    # сторонние домены, без которых сайт не отрисовывает ленту (CDN со скриптами и т.п.)
+    allowed_domains: tuple[str, ...] = ()
+
+    def block_reason(self, resource_type: str, url: str) -> str | None:
+        if resource_type == 'document':
+            return None
+        host = urlsplit(url).hostname or ''
+        if _host_matches(host, self.blocked_domains):
+            return 'domain'
+        if resource_type in self.blocked_types:
+            return 'type'
+        if (
+            self.block_third_party
+            and not _host_matches(host, self.first_party_domains)
+            and not _host_matches(host, self.allowed_domains)
+        ):
+            return 'third_party'
+        return None
+
+
+@dataclass(slots=True)
+class ResourceBlocker:
+    site: str
+    rules: BlockingRules
+    allowed_requests: int = 0
+    blocked_requests: Counter[str] = field(default_factory=Counter)
+    blocked_reasons: Counter[str] = field(default_factory=Counter)
+    _observed_bytes: Counter[str] = field(default_factory=Counter)
+    _observed_count: Counter[str] = field(default_factory=Counter)
+
+    async def install(self, context: BrowserContext) -> None:
+        await context.route('**/*', self._handle)
+        context.on('response', self._on_response)
+
+    async def _handle(self, route: Route) -> None:
+        request = route.request
+        reason = self.rules.block_reason(request.resource_type, request.url)
+        if reason is None:
+            self.allowed_requests += 1
+            await route.continue_()
+            return
+        self.blocked_requests[request.resource_type] += 1
+        self.blocked_reasons[reason] += 1
+        await route.abort('blockedbyclient')
+
+    def _on_response(self, response: Response) -> None:
+        length = response.headers.get('content-length')
+        if not length or not length.isdigit():
+            return
+        resource_type = response.request.resource_type
+        self._observed_bytes[resource_type] += int(length)
+        self._observed_count[resource_type] += 1
+
+    def estimated_saved_bytes(self) -> int:
+        total = 0
+        for resource_type, count in self.blocked_requests.items():
+            if self._observed_count[resource_type]:
+                average = self._observed_bytes[resource_type] / self._observed_count[resource_type]
+            else:
+                average = FALLBACK_SIZE_BYTES.get(resource_type, 10_000)
+            total += int(average * count)
+        return total
+
+    def report(self, logger: logging.Logger) -> None:
+        json_log(
+            logger,
+            'resource_blocking_stats',
+            site=self.site,
+            allowed_requests=self.allowed_requests,
+            blocked_requests=sum(self.blocked_requests.values()),
+            blocked_by_type=dict(self.blocked_requests),
+            blocked_by_reason=dict(self.blocked_reasons),
+            estimated_saved_bytes=self.estimated_saved_bytes(),
+        )
+        self.allowed_requests = 0
+        self.blocked_requests.clear()
+        self.blocked_reasons.clear()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from blocking import BlockingRules, ResourceBlocker
+from logging_utils import json_log
+
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+]
+
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'device_scale_factor': 1,
+    'is_mobile': False,
+    'has_touch': False,
+    'locale': 'ru-RU',
+    'timezone_id': 'Europe/Moscow',
+    'color_scheme': 'light',
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+}
+
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    Object.defineProperty(navigator, 'language', {get: () => 'ru-RU'});
+    Object.defineProperty(navigator, 'languages', {get: () => ['ru-RU', 'ru']});
+    Object.defineProperty(navigator, 'platform', {get: () => 'Win32'});
+"""
+
+
+@dataclass(slots=True)
+class _SiteContext:
+    context: BrowserContext
+    created_at: float = field(default_factory=time.monotonic)
+    pages_opened: int = 0
+    crashed: bool = False
+
+
+class BrowserManager:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        state_dir: Path,
+        context_max_pages: int,
+        context_max_age_seconds: int,
+        probe_timeout_seconds: float,
+    ):
+        self.logger = logger
+        self.state_dir = state_dir
+        self.context_max_pages = context_max_pages
+        self.context_max_age_seconds = context_max_age_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._contexts: dict[str, _SiteContext] = {}
+        self._blockers: dict[str, ResourceBlocker] = {}
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> BrowserManager:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._playwright = await async_playwright().start()
+        await self._launch()
+
+    async def close(self) -> None:
+        async with self._lock:
+            for site in list(self._contexts):
+                await self._close_context(site)
+            await self._shutdown_browser()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def context(self, site: str, blocking: BlockingRules | None = None) -> BrowserContext:
+        async with self._lock:
+            if not await self._is_healthy():
+                await self._relaunch()
+            slot = self._contexts.get(site)
+            if slot is not None and self._needs_recycle(slot):
+                json_log(
+                    self.logger,
+                    'browser_context_recycle',
+                    site=site,
+                    pages=slot.pages_opened,
+                    age_seconds=round(time.monotonic() - slot.created_at),
+                    crashed=slot.crashed,
+                )
+                await self._close_context(site)
+                slot = None
+            if slot is None:
+                slot = await self._open_context(site, blocking)
+            return slot.context
+
+    async def save_state(self, site: str) -> None:
+        slot = self._contexts.get(site)
+        if slot is None:
+            return
+        try:
+            await slot.context.storage_state(path=self._state_path(site))
+        except Exception as exc:
+            json_log(self.logger, 'browser_state_save_error', site=site, error=str(exc))
+
+    def report_blocking(self, site: str) -> None:
+        blocker = self._blockers.get(site)
+        if blocker is not None:
+            blocker.report(self.logger)
+
+    def _state_path(self, site: str) -> Path:
+        return self.state_dir / f'{site}.json'
+
+    def _needs_recycle(self, slot: _SiteContext) -> bool:
+        return (
+            slot.crashed
+            or slot.pages_opened >= self.context_max_pages
+            or time.monotonic() - slot.created_at >= self.context_max_age_seconds
+        )
+
+    async def _launch(self) -> None:
+        assert self._playwright is not None
+        self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        self._browser.on('disconnected', lambda _: json_log(self.logger, 'browser_disconnected'))
+        json_log(self.logger, 'browser_launched', version=self._browser.version)
+
+    async def _relaunch(self) -> None:
+        json_log(self.logger, 'browser_relaunch', contexts=len(self._contexts))
+        # сохранить состояние у зависшего браузера уже не получится
+        self._contexts.clear()
+        await self._shutdown_browser()
+        await self._launch()
+
+    async def _shutdown_browser(self) -> None:
+        if self._browser is None:
+            return
+        try:
+            await asyncio.wait_for(self._browser.close(), timeout=self.probe_timeout_seconds)
+        except Exception as exc:
+            json_log(self.logger, 'browser_close_error', error=str(exc))
+        self._browser = None
+
+    async def _is_healthy(self) -> bool:
+        if self._browser is None or not self._browser.is_connected():
+            return False
+        try:
+            probe = await asyncio.wait_for(self._browser.new_page(), timeout=self.probe_timeout_seconds)
+            await asyncio.wait_for(probe.close(), timeout=self.probe_timeout_seconds)
+        except Exception as exc:
+            json_log(self.logger, 'browser_probe_failed', error=str(exc))
+            return False
+        return True
+
+    async def _open_context(self, site: str, blocking: BlockingRules | None) -> _SiteContext:
+        assert self._browser is not None
+        state_path = self._state_path(site)
+        try:
+            context = await self._browser.new_context(
+                **CONTEXT_OPTIONS,
+                storage_state=state_path if state_path.exists() else None,
+            )
+        except Exception as exc:
+            json_log(self.logger, 'browser_state_load_error', site=site, error=str(exc))
+            state_path.unlink(missing_ok=True)
+            context = await self._browser.new_context(**CONTEXT_OPTIONS)
+        await context.add_init_script(STEALTH_SCRIPT)
+        if blocking is not None:
+            blocker = self._blockers.setdefault(site, ResourceBlocker(site, blocking))
+            await blocker.install(context)
+        slot = _SiteContext(context)
+
+        def _on_page(page: Page) -> None:
+            slot.pages_opened += 1
+            page.on('crash', lambda _: _mark_crashed())
+
+        def _mark_crashed() -> None:
+            slot.crashed = True
+            json_log(self.logger, 'browser_page_crashed', site=site)
+
+        context.on('page', _on_page)
+        self._contexts[site] = slot
+        json_log(self.logger, 'browser_context_opened', site=site, restored_state=state_path.exists())
+        return slot
+
+    async def _close_context(self, site: str) -> None:
+        slot = self._contexts.get(site)
+        if slot is None:
+            return
+        if not slot.crashed:
+            await self.save_state(site)
+        del self._contexts[site]
+        try:
+            await asyncio.wait_for(slot.context.close(), timeout=self.probe_timeout_seconds)
+        except Exception as exc:
+            json_log(self.logger, 'browser_context_close_error', site=site, error=str(exc))
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Collection, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from playwright.async_api import BrowserContext, Page
+
+from browser import BrowserManager
+from logging_utils import json_log
+from parsers.common import BlockedError, CircuitBreaker
+from parsers.http_fast import ArticleResult, HttpFastPath
+from parsers.sources import Source
+from storage import PublishedStorage
+
+
+@dataclass(slots=True)
+class ScrapedArticle:
+    source: str
+    title: str
+    lead: str
+    image_url: str
+    link: str
+    # time.monotonic() в момент разбора статьи, для замера задержки до очереди публикации
+    scraped_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass(slots=True)
+class SourceResult:
+    source: str
+    articles: int = 0
+    new_links: int = 0
+    error: str | None = None
+    # источник пропущен, пока у него открыт circuit breaker
+    skipped: bool = False
+    retry_at: float | None = None
+
+
+class PagePool:
+    def __init__(self, context: BrowserContext, page_slots: asyncio.Semaphore, max_concurrency: int):
+        self.context = context
+        self._page_slots = page_slots
+        self._source_slots = asyncio.Semaphore(max_concurrency)
+        self._idle: list[Page] = []
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._source_slots, self._page_slots:
+            page = self._idle.pop() if self._idle else await self.context.new_page()
+            try:
+                yield page
+            except BaseException:
+                await page.close()
+                raise
+            self._idle.append(page)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        # слот источника без страницы — для запросов быстрого пути
+        async with self._source_slots:
+            yield
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._idle.pop().close()
+
+
+class ArticleCollector:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        browser_manager: BrowserManager,
+        storage: PublishedStorage,
+        sources: Sequence[Source],
+        max_pages: int,
+        source_concurrency: int,
+        block_resources: bool,
+        listing_max_pages: int,
+        listing_known_streak: int,
+        breaker_failure_threshold: int,
+        breaker_base_cooldown_seconds: float,
+        breaker_max_cooldown_seconds: float,
+        fast_path: HttpFastPath | None = None,
+    ):
+        self.logger = logger
+        self.browser_manager = browser_manager
+        self.storage = storage
+        self.sources = list(sources)
+        self.max_pages = max_pages
+        self.source_concurrency = source_concurrency
+        self.block_resources = block_resources
+        self.listing_max_pages = listing_max_pages
+        self.listing_known_streak = listing_known_streak
+        self.fast_path = fast_path
+        self._breakers = {
+            source.name: CircuitBreaker(
+                source.name,
+                logger,
+                failure_threshold=breaker_failure_threshold,
+                base_cooldown_seconds=breaker_base_cooldown_seconds,
+                max_cooldown_seconds=breaker_max_cooldown_seconds,
+            )
+            for source in self.sources
+        }
+
+    async def collect(
+        self,
+        channel: asyncio.Queue[ScrapedArticle],
+        names: Collection[str] | None = None,
+    ) -> list[SourceResult]:
+        # статьи уходят в channel по мере разбора; put() ждёт, пока потребитель не освободит место
+        started = time.monotonic()
+        sources: list[Source] = []
+        skipped: list[SourceResult] = []
+        for source in self.sources:
+            if names is not None and source.name not in names:
+                continue
+            breaker = self._breakers[source.name]
+            if breaker.allow():
+                sources.append(source)
+                continue
+            json_log(self.logger, 'source_skipped_circuit_open', source=source.name, retry_at=round(breaker.open_until))
+            skipped.append(SourceResult(source.name, skipped=True, retry_at=breaker.open_until))
+
+        page_slots = asyncio.Semaphore(self.max_pages)
+        gathered = await asyncio.gather(
+            *(self._collect_source(source, page_slots, channel) for source in sources),
+            return_exceptions=True,
+        )
+
+        results = skipped
+        for source, result in zip(sources, gathered):
+            if isinstance(result, BaseException):
+                json_log(self.logger, 'source_collect_error', source=source.name, error=str(result))
+                result = SourceResult(source.name, error=str(result))
+            results.append(result)
+        json_log(
+            self.logger,
+            'collect_complete',
+            sources=[source.name for source in sources],
+            count=sum(result.articles for result in results),
+            elapsed_seconds=round(time.monotonic() - started, 2),
+        )
+        return results
+
+    async def _collect_source(
+        self,
+        source: Source,
+        page_slots: asyncio.Semaphore,
+        channel: asyncio.Queue[ScrapedArticle],
+    ) -> SourceResult:
+        started = time.monotonic()
+        context = await self.browser_manager.context(
+            source.name,
+            source.blocking if self.block_resources else None,
+        )
+        pool = PagePool(context, page_slots, source.max_concurrency or self.source_concurrency)
+        breaker = self._breakers[source.name]
+        try:
+            try:
+                links, error = await self._crawl_listing(pool, source)
+            except BlockedError as exc:
+                json_log(self.logger, 'source_blocked', source=source.name, error=str(exc))
+                breaker.record_failure(str(exc), blocked=True)
+                return SourceResult(source.name, error=f'blocked: {exc}')
+            results = await asyncio.gather(*(self._collect_article(pool, source, link, channel) for link in links))
+        finally:
+            await pool.close()
+            await self.browser_manager.save_state(source.name)
+            self.browser_manager.report_blocking(source.name)
+            if self.fast_path is not None and source.fast_path_rules is not None:
+                self.fast_path.report(source.name)
+
+        if error:
+            breaker.record_failure(error)
+        elif not breaker.is_open:
+            breaker.record_success()
+
+        parsed = sum(results)
+        json_log(
+            self.logger,
+            'source_complete',
+            source=source.name,
+            new_links=len(links),
+            articles=parsed,
+            elapsed_seconds=round(time.monotonic() - started, 2),
+        )
+        return SourceResult(source.name, articles=parsed, new_links=len(links), error=error)
+
+    async def _crawl_listing(self, pool: PagePool, source: Source) -> tuple[list[str], str | None]:
+        # идём по ленте от новых к старым и останавливаемся на уже сохранённых ссылках;
+        # следующую страницу открываем, только если вся текущая оказалась новой
+        new_links: list[str] = []
+        seen: set[str] = set()
+        listed = 0
+        known_streak = 0
+        url: str | None = None
+        error: str | None = None
+        for depth in range(1, self.listing_max_pages + 1):
+            async with pool.page() as page:
+                listing = await source.links_parser(page, self.logger, url)
+            if listing.error and depth == 1:
+                error = listing.error
+            fresh = set(await asyncio.to_thread(self.storage.filter_new_links, listing.links))
+            for link in listing.links:
+                if link in seen:
+                    continue
+                seen.add(link)
+                listed += 1
+                if link not in fresh:
+                    known_streak += 1
+                    if known_streak >= self.listing_known_streak:
+                        break
+                    continue
+                known_streak = 0
+                new_links.append(link)
+            else:
+                if listing.next_url and listing.next_url != url:
+                    url = listing.next_url
+                    continue
+            break
+        json_log(
+            self.logger,
+            'source_links_filtered',
+            source=source.name,
+            pages=depth,
+            listed=listed,
+            new=len(new_links),
+            skipped_known=listed - len(new_links),
+            reached_known=known_streak >= self.listing_known_streak,
+        )
+        return new_links, error
+
+    async def _collect_article(
+        self,
+        pool: PagePool,
+        source: Source,
+        link: str,
+        channel: asyncio.Queue[ScrapedArticle],
+    ) -> bool:
+        # breaker мог открыться, пока задача ждала слота: проверяем после получения слота, перед каждым обращением к сайту
+        breaker = self._breakers[source.name]
+        result: ArticleResult | None = None
+        if self.fast_path is not None and source.fast_path_rules is not None:
+            async with pool.slot():
+                if breaker.is_open:
+                    return False
+                result = await self.fast_path.fetch_article(source.name, link, source.fast_path_rules)
+        if result is None:
+            async with pool.page() as page:
+                if breaker.is_open:
+                    return False
+                try:
+                    result = await source.article_parser(page, link, self.logger)
+                except BlockedError as exc:
+                    json_log(self.logger, 'article_blocked', source=source.name, url=link, error=str(exc))
+                    breaker.record_failure(str(exc), blocked=True)
+                    return False
+        title, lead, image_url = result
+        if not title or not lead:
+            return False
+        await channel.put(ScrapedArticle(source.name, title, lead, image_url or '', link))
+        return True
@@ -16,6 +16,15 @@ class Settings:
     telegram_chat_id: str
     admin_chat_id: str
     openrouter_api_key: str | None
+    llm_base_url: str
+    llm_model: str
+    llm_timeout_seconds: float
+    llm_max_concurrency: int
+    llm_max_retries: int
+    llm_cache_ttl_seconds: int
+    llm_cache_max_entries: int
+    llm_cache_memory_entries: int
+    llm_batch_verify: bool
     database_path: Path
     log_file: Path
     log_max_bytes: int
@@ -24,6 +33,53 @@ class Settings:
     publish_jitter_min_seconds: float
     publish_jitter_max_seconds: float
     cycle_sleep_seconds: int
+    poll_min_seconds: int
+    poll_max_seconds: int
+    poll_target_new_links: float
+    pipeline_channel_size: int
+    dedup_batch_size: int
+    dedup_batch_linger_seconds: float
+    # без модели склеиваем статьи батча на тех же основаниях, что и с историей: порог FAISS 0.9
+    dedup_cluster_threshold: float
+    dedup_index_backend: str
+    dedup_top_k: int
+    dedup_min_score: float
+    dedup_hnsw_m: int
+    dedup_hnsw_ef_search: int
+    dedup_ivf_nlist: int
+    dedup_ivf_nprobe: int
+    index_snapshot_dir: Path
+    index_snapshot_interval_seconds: int
+    embedding_storage_dtype: str
+    dedup_recent_window: int
+    # 0 — окно индекса по этому признаку не ограничено
+    dedup_window_seconds: int
+    dedup_window_max_rows: int
+    dedup_lexical: bool
+    dedup_lexical_threshold: float
+    minhash_permutations: int
+    minhash_bands: int
+    # источники по убыванию приоритета; пусто — порядок SOURCES
+    dedup_source_priority: tuple[str, ...]
+    inference_workers: int
+    inference_max_pending: int
+    inference_use_processes: bool
+    scrape_max_pages: int
+    scrape_source_concurrency: int
+    scrape_block_resources: bool
+    listing_max_pages: int
+    listing_known_streak: int
+    breaker_failure_threshold: int
+    breaker_base_cooldown_seconds: int
+    breaker_max_cooldown_seconds: int
+    http_fast_path: bool
+    http_timeout_seconds: float
+    http_max_connections: int
+    http_connections_per_host: int
+    browser_state_dir: Path
+    browser_context_max_pages: int
+    browser_context_max_age_seconds: int
+    browser_probe_timeout_seconds: float
 
 
 def _must_getenv(name: str) -> str:
@@ -33,11 +89,31 @@ def _must_getenv(name: str) -> str:
     return value
 
 
+def _getenv_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name, '').strip().lower()
+    if not value:
+        return default
+    return value not in {'0', 'false', 'no', 'off'}
+
+
+def _getenv_list(name: str) -> tuple[str, ...]:
+    return tuple(item.strip() for item in os.getenv(name, '').split(',') if item.strip())
+
+
 SETTINGS = Settings(
     telegram_token=_must_getenv('TELEGRAM_TOKEN'),
     telegram_chat_id=_must_getenv('TELEGRAM_CHAT_ID'),
     admin_chat_id=_must_getenv('ADMIN_CHAT_ID'),
     openrouter_api_key=os.getenv('OPENROUTER_API_KEY', '').strip() or None,
+    llm_base_url=os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1').strip(),
+    llm_model=os.getenv('LLM_MODEL', 'qwen/qwen3.6-plus-preview:free').strip(),
+    llm_timeout_seconds=float(os.getenv('LLM_TIMEOUT_SECONDS', 30)),
+    llm_max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 4)),
+    llm_max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+    llm_cache_ttl_seconds=int(os.getenv('LLM_CACHE_TTL_SECONDS', 30 * 24 * 3600)),
+    llm_cache_max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 100_000)),
+    llm_cache_memory_entries=int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 2048)),
+    llm_batch_verify=_getenv_bool('LLM_BATCH_VERIFY', True),
     database_path=BASE_DIR / 'published_articles.db',
     log_file=BASE_DIR / 'log_parser.txt',
     log_max_bytes=int(os.getenv('LOG_MAX_BYTES', 5 * 1024 * 1024)),
@@ -46,4 +122,48 @@ SETTINGS = Settings(
     publish_jitter_min_seconds=float(os.getenv('PUBLISH_JITTER_MIN_SECONDS', 2)),
     publish_jitter_max_seconds=float(os.getenv('PUBLISH_JITTER_MAX_SECONDS', 5)),
     cycle_sleep_seconds=int(os.getenv('CYCLE_SLEEP_SECONDS', 10800)),
+    poll_min_seconds=int(os.getenv('POLL_MIN_SECONDS', 600)),
+    poll_max_seconds=int(os.getenv('POLL_MAX_SECONDS', 6 * 3600)),
+    poll_target_new_links=float(os.getenv('POLL_TARGET_NEW_LINKS', 2)),
+    pipeline_channel_size=int(os.getenv('PIPELINE_CHANNEL_SIZE', 20)),
+    dedup_batch_size=int(os.getenv('DEDUP_BATCH_SIZE', 16)),
+    dedup_batch_linger_seconds=float(os.getenv('DEDUP_BATCH_LINGER_SECONDS', 2.0)),
+    dedup_cluster_threshold=float(os.getenv('DEDUP_CLUSTER_THRESHOLD', 0.9)),
+    dedup_index_backend=os.getenv('DEDUP_INDEX_BACKEND', 'flat').strip().lower(),
+    dedup_top_k=int(os.getenv('DEDUP_TOP_K', 10)),
+    dedup_min_score=float(os.getenv('DEDUP_MIN_SCORE', 0.5)),
+    dedup_hnsw_m=int(os.getenv('DEDUP_HNSW_M', 32)),
+    dedup_hnsw_ef_search=int(os.getenv('DEDUP_HNSW_EF_SEARCH', 64)),
+    dedup_ivf_nlist=int(os.getenv('DEDUP_IVF_NLIST', 1024)),
+    dedup_ivf_nprobe=int(os.getenv('DEDUP_IVF_NPROBE', 16)),
+    index_snapshot_dir=BASE_DIR / 'index_snapshot',
+    index_snapshot_interval_seconds=int(os.getenv('INDEX_SNAPSHOT_INTERVAL_SECONDS', 1800)),
+    embedding_storage_dtype=os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32').strip().lower(),
+    dedup_recent_window=int(os.getenv('DEDUP_RECENT_WINDOW', 10)),
+    dedup_window_seconds=int(os.getenv('DEDUP_WINDOW_SECONDS', 0)),
+    dedup_window_max_rows=int(os.getenv('DEDUP_WINDOW_MAX_ROWS', 0)),
+    dedup_lexical=_getenv_bool('DEDUP_LEXICAL', True),
+    dedup_lexical_threshold=float(os.getenv('DEDUP_LEXICAL_THRESHOLD', 0.8)),
+    minhash_permutations=int(os.getenv('MINHASH_PERMUTATIONS', 64)),
+    minhash_bands=int(os.getenv('MINHASH_BANDS', 16)),
+    dedup_source_priority=_getenv_list('DEDUP_SOURCE_PRIORITY'),
+    inference_workers=int(os.getenv('INFERENCE_WORKERS', 1)),
+    inference_max_pending=int(os.getenv('INFERENCE_MAX_PENDING', 32)),
+    inference_use_processes=_getenv_bool('INFERENCE_USE_PROCESSES', False),
+    scrape_max_pages=int(os.getenv('SCRAPE_MAX_PAGES', 6)),
+    scrape_source_concurrency=int(os.getenv('SCRAPE_SOURCE_CONCURRENCY', 2)),
+    scrape_block_resources=_getenv_bool('SCRAPE_BLOCK_RESOURCES', True),
+    listing_max_pages=int(os.getenv('LISTING_MAX_PAGES', 3)),
+    listing_known_streak=int(os.getenv('LISTING_KNOWN_STREAK', 1)),
+    breaker_failure_threshold=int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3)),
+    breaker_base_cooldown_seconds=int(os.getenv('BREAKER_BASE_COOLDOWN_SECONDS', 900)),
+    breaker_max_cooldown_seconds=int(os.getenv('BREAKER_MAX_COOLDOWN_SECONDS', 12 * 3600)),
+    http_fast_path=_getenv_bool('HTTP_FAST_PATH', True),
+    http_timeout_seconds=float(os.getenv('HTTP_TIMEOUT_SECONDS', 15)),
+    http_max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', 20)),
+    http_connections_per_host=int(os.getenv('HTTP_CONNECTIONS_PER_HOST', 4)),
+    browser_state_dir=BASE_DIR / 'browser_state',
+    browser_context_max_pages=int(os.getenv('BROWSER_CONTEXT_MAX_PAGES', 200)),
+    browser_context_max_age_seconds=int(os.getenv('BROWSER_CONTEXT_MAX_AGE_SECONDS', 6 * 3600)),
+    browser_probe_timeout_seconds=float(os.getenv('BROWSER_PROBE_TIMEOUT_SECONDS', 15)),
 )
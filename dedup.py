@@ -1,159 +1,665 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import os
+import re
+import time
+from array import array
+from collections import Counter
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any
 
-import faiss
 import numpy as np
-import requests
-from sentence_transformers import CrossEncoder, SentenceTransformer
 
+from inference import InferenceExecutor
+from lexical import MinHashIndex
+from llm_cache import LLMVerdictCache, pair_key
+from llm_client import LLMClient
 from logging_utils import json_log
+from vector_index import VectorIndex, normalize_rows
+
+EMBEDDING_MODEL = 'all-mpnet-base-v2'
+EMBEDDING_DIMENSION = 768
+CROSS_MODEL = 'cross-encoder/stsb-roberta-large'
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_INDEX_FILE = 'index.faiss'
+SNAPSHOT_IDS_FILE = 'row_ids.npy'
+SNAPSHOT_META_FILE = 'meta.json'
+SNAPSHOT_MINHASH_FILE = 'minhash.npz'
+# сколько строк снимка сверяется с базой по ссылке при загрузке
+SNAPSHOT_PROBE_ROWS = 16
+
+# «1, 3», «2 и 4», «1;2»
+_MULTI_ANSWER_RE = re.compile(r'\d+(?:\s*(?:,|;|и)\s*\d+)*')
+
+
+def _cluster(embeddings: np.ndarray, threshold: float, order: Sequence[int]) -> list[tuple[int, list[int]]]:
+    # жадная кластеризация вокруг представителя, строки эмбеддингов нормированы:
+    # очередной свободный по order становится представителем и забирает только тех,
+    # кто сам похож на него не меньше threshold, — цепочки A~B~C не склеиваются
+    similarity = embeddings @ embeddings.T
+    unassigned = set(range(len(embeddings)))
+    clusters: list[tuple[int, list[int]]] = []
+    for representative in order:
+        if representative not in unassigned:
+            continue
+        members = [row for row in sorted(unassigned) if row == representative or similarity[representative, row] >= threshold]
+        unassigned.difference_update(members)
+        clusters.append((representative, members))
+    return clusters
+
+
+def build_pair_prompt(text1: str, text2: str) -> str:
+    return (
+        'Ты профессиональный редактор автомобильных новостей. Твоя задача: определить, описывают ли эти два текста '
+        'одно и то же событие, даже если слова и формулировки разные. Ответь только Да или Нет, без пояснений.\n\n'
+        f'Текст 1:\n{text1}\n\nТекст 2:\n{text2}'
+    )
+
+
+def build_multi_prompt(text: str, candidates: Sequence[str]) -> str:
+    numbered = '\n'.join(f'{number}. {candidate}' for number, candidate in enumerate(candidates, start=1))
+    return (
+        'Ты профессиональный редактор автомобильных новостей. Твоя задача: определить, какие из кандидатов описывают '
+        'то же событие, что и новая статья, даже если слова и формулировки разные. Ответь только номерами '
+        'подходящих кандидатов через запятую или словом Нет, без пояснений.\n\n'
+        f'Новая статья:\n{text}\n\nКандидаты:\n{numbered}'
+    )
+
+
+def parse_multi_answer(answer: str, count: int) -> list[int] | None:
+    # индексы кандидатов с нуля; [] — совпадений нет; None — ответ не разобран
+    normalized = answer.strip().lower().strip('.!')
+    if normalized in {'нет', 'none', 'no', '0'}:
+        return []
+    if not _MULTI_ANSWER_RE.fullmatch(normalized):
+        return None
+    numbers = [int(number) for number in re.findall(r'\d+', normalized)]
+    if not numbers or any(number < 1 or number > count for number in numbers):
+        return None
+    return sorted({number - 1 for number in numbers})
+
+
+@dataclass(slots=True)
+class DedupVerdict:
+    link: str
+    # текст в нижнем регистре и нормированный эмбеддинг — то же, что уходит в хранилище и индекс;
+    # эмбеддинга нет, если дубль отсеян лексическим фильтром до модели
+    text: str
+    embedding: np.ndarray | None = None
+    signature: np.ndarray | None = None
+    is_duplicate: bool = False
+    # решения нет (LLM не ответил по сильному кандидату): статью не сохраняют и не публикуют,
+    # ссылка останется новой и проверится при следующем опросе
+    deferred: bool = False
+    stage: str = 'unique'
+    matched_link: str | None = None
+    score: float | None = None
+    evidence: dict[str, Any] = field(default_factory=dict)
+
+    def mark(self, stage: str, matched_link: str, score: float | None = None) -> None:
+        self.is_duplicate = True
+        self.stage = stage
+        self.matched_link = matched_link
+        self.score = score
+
+    def defer(self, stage: str, matched_link: str | None = None, score: float | None = None) -> None:
+        self.deferred = True
+        self.stage = stage
+        self.matched_link = matched_link
+        self.score = score
 
 
 class DuplicateDetector:
-    def __init__(self, logger: logging.Logger, openrouter_api_key: str | None = None):
+    def __init__(
+        self,
+        logger: logging.Logger,
+        executor: InferenceExecutor,
+        index: VectorIndex,
+        fetch_texts: Callable[[Sequence[int]], dict[int, tuple[str, str]]],
+        llm: LLMClient | None = None,
+        llm_cache: LLMVerdictCache | None = None,
+        llm_batch_verify: bool = True,
+        top_k: int = 10,
+        min_score: float = 0.5,
+        cluster_threshold: float = 0.9,
+        source_priority: Sequence[str] = (),
+        lexical: MinHashIndex | None = None,
+        lexical_threshold: float = 0.8,
+        compact_fraction: float = 0.25,
+    ):
         self.logger = logger
-        self.openrouter_api_key = openrouter_api_key
-        self.model = SentenceTransformer('all-mpnet-base-v2')
-        self.cross_model = CrossEncoder('cross-encoder/stsb-roberta-large')
-        self.faiss_index: faiss.IndexFlatIP | None = None
-        self.faiss_texts: list[tuple[str, str]] = []
-
-    def build_index(self, published_data: list[dict[str, Any]]) -> None:
-        dimension = 768
-        self.faiss_index = faiss.IndexFlatIP(dimension)
-        self.faiss_texts = []
-        vectors: list[np.ndarray] = []
-
-        for item in published_data:
-            embedding = item.get('embedding')
-            if not embedding:
-                continue
-            emb = np.array(embedding, dtype='float32')
-            norm = np.linalg.norm(emb)
-            if norm != 0:
-                emb = emb / norm
-            vectors.append(emb)
-            self.faiss_texts.append((item.get('link', ''), item.get('text', '')))
-
-        if vectors:
-            self.faiss_index.add(np.vstack(vectors))
-        json_log(self.logger, 'faiss_index_built', total=len(vectors))
-
-    def encode_text(self, text: str) -> list[float]:
-        return self.model.encode(text, convert_to_numpy=True).tolist()
-
-    def add_embedding(self, link: str, text: str, embedding: list[float]) -> None:
-        if self.faiss_index is None:
-            self.faiss_index = faiss.IndexFlatIP(768)
-        emb = np.array(embedding, dtype='float32')
-        norm = np.linalg.norm(emb)
-        if norm != 0:
-            emb = emb / norm
-        self.faiss_index.add(np.expand_dims(emb, axis=0))
-        self.faiss_texts.append((link, text.lower()))
-        json_log(self.logger, 'faiss_index_updated', link=link, total=self.faiss_index.ntotal)
-
-    def is_duplicate(
+        self.executor = executor
+        # None — ключа OpenRouter нет, LLM-этапы пропускаются
+        self.llm = llm
+        self.llm_cache = llm_cache
+        self.llm_batch_verify = llm_batch_verify
+        self.cluster_threshold = cluster_threshold
+        # источник -> ранг; чем меньше, тем охотнее статья остаётся представителем кластера
+        self.source_rank = {name: rank for rank, name in enumerate(source_priority)}
+        self.index = index
+        self.top_k = top_k
+        # кандидаты с косинусом ниже min_score дальше FAISS не идут
+        self.min_score = min_score
+        # id -> (link, text); тексты кандидатов читаются из базы по требованию
+        self.fetch_texts = fetch_texts
+        # в памяти только id строк published_articles в порядке позиций индекса
+        self.row_ids = array('q')
+        # максимальный id строки, которую индекс уже видел
+        self.high_water = 0
+        # индекс изменился после последнего снимка
+        self.snapshot_dirty = False
+        # строки с id меньше min_row_id вышли из окна; stale_rows из них ещё лежат в индексе
+        self.min_row_id = 0
+        self.stale_rows = 0
+        self.compact_fraction = compact_fraction
+        # почти дословные копии по оценке Жаккара MinHash отсекаются до моделей
+        self.lexical = lexical
+        self.lexical_threshold = lexical_threshold
+        self.stage_counts: Counter[str] = Counter()
+
+    def build_index(self, row_ids: np.ndarray, embeddings: np.ndarray) -> None:
+        self.row_ids = array('q', row_ids.tolist())
+        self.high_water = int(row_ids.max()) if len(row_ids) else 0
+        self.index.build(normalize_rows(embeddings))
+        self.stale_rows = 0
+        self.snapshot_dirty = True
+
+    def replay(self, row_ids: np.ndarray, embeddings: np.ndarray) -> None:
+        # дописываем строки, появившиеся после снимка
+        if len(row_ids):
+            self.index.add(normalize_rows(embeddings))
+            self.row_ids.extend(row_ids.tolist())
+            self.high_water = max(self.high_water, int(row_ids.max()))
+            self.snapshot_dirty = True
+        json_log(self.logger, 'faiss_index_replayed', rows=len(row_ids), total=self.index.ntotal)
+
+    def remember(self, row_id: int, verdict: DedupVerdict) -> None:
+        if verdict.embedding is not None:
+            self.add_embedding(row_id, verdict.link, verdict.embedding)
+        if self.lexical is not None and verdict.signature is not None:
+            self.lexical.add(row_id, verdict.signature)
+            self.snapshot_dirty = True
+
+    def add_embedding(self, row_id: int, link: str, embedding: np.ndarray) -> None:
+        self.index.add(normalize_rows(embedding))
+        self.row_ids.append(row_id)
+        self.high_water = max(self.high_water, row_id)
+        self.snapshot_dirty = True
+        json_log(self.logger, 'faiss_index_updated', link=link, total=self.index.ntotal)
+
+    def evict(self, min_row_id: int | None = None, max_rows: int | None = None) -> int:
+        # скользящее окно: строки старше min_row_id и сверх последних max_rows сразу перестают находиться
+        # поиском, а из индекса удаляются, только когда их доля дорастёт до compact_fraction
+        if self.lexical is not None and self.lexical.evict(min_row_id, max_rows):
+            self.snapshot_dirty = True
+        row_ids = np.frombuffer(self.row_ids, dtype='int64')
+        floor = self.min_row_id
+        if min_row_id is not None:
+            floor = max(floor, min_row_id)
+        if max_rows is not None and len(row_ids) > max_rows:
+            floor = max(floor, int(row_ids[len(row_ids) - max_rows]))
+        self.min_row_id = floor
+        # позиции идут в порядке добавления, то есть по возрастанию id
+        self.stale_rows = int(np.searchsorted(row_ids, floor))
+        if not self.stale_rows or self.stale_rows < self.compact_fraction * len(row_ids):
+            return 0
+
+        evicted = self.stale_rows
+        started = time.perf_counter()
+        self.index.remove_prefix(evicted)
+        self.row_ids = array('q', row_ids[evicted:].tobytes())
+        self.stale_rows = 0
+        self.snapshot_dirty = True
+        json_log(
+            self.logger,
+            'faiss_index_evicted',
+            evicted=evicted,
+            total=self.index.ntotal,
+            oldest_row_id=self.row_ids[0] if self.row_ids else None,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        return evicted
+
+    def save_snapshot(self, directory: Path) -> None:
+        started = time.perf_counter()
+        directory.mkdir(parents=True, exist_ok=True)
+        meta = self.index.save(directory / SNAPSHOT_INDEX_FILE)
+        ids_tmp = directory / (SNAPSHOT_IDS_FILE + '.tmp')
+        with ids_tmp.open('wb') as fh:
+            np.save(fh, np.frombuffer(self.row_ids, dtype='int64'))
+        os.replace(ids_tmp, directory / SNAPSHOT_IDS_FILE)
+        if self.lexical is not None:
+            self.lexical.save(directory / SNAPSHOT_MINHASH_FILE)
+        # meta пишется последней и служит признаком целого снимка
+        meta.update(version=SNAPSHOT_VERSION, high_water=self.high_water, probe=self._snapshot_probe())
+        meta_tmp = directory / (SNAPSHOT_META_FILE + '.tmp')
+        meta_tmp.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(meta_tmp, directory / SNAPSHOT_META_FILE)
+        self.snapshot_dirty = False
+        json_log(
+            self.logger,
+            'faiss_snapshot_saved',
+            total=self.index.ntotal,
+            high_water=self.high_water,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def load_snapshot(self, directory: Path) -> bool:
+        # False — снимка нет или он негоден, нужна полная пересборка
+        started = time.perf_counter()
+        try:
+            meta = json.loads((directory / SNAPSHOT_META_FILE).read_text(encoding='utf-8'))
+            row_ids = np.load(directory / SNAPSHOT_IDS_FILE).astype('int64', copy=False)
+        except FileNotFoundError:
+            json_log(self.logger, 'faiss_snapshot_missing', path=str(directory))
+            return False
+        except Exception as exc:
+            json_log(self.logger, 'faiss_snapshot_corrupt', path=str(directory), error=str(exc))
+            return False
+
+        if meta.get('version') != SNAPSHOT_VERSION or len(row_ids) != meta.get('ntotal'):
+            json_log(self.logger, 'faiss_snapshot_mismatch', path=str(directory), meta=meta)
+            return False
+        if not self.index.load(directory / SNAPSHOT_INDEX_FILE, meta):
+            json_log(self.logger, 'faiss_snapshot_mismatch', path=str(directory), meta=meta)
+            return False
+
+        if not self._probe_matches(meta.get('probe') or []):
+            # база подменена или усечена: старые векторы указывали бы на чужие id,
+            # а новые строки с id не больше high_water не попали бы в replay
+            json_log(self.logger, 'faiss_snapshot_stale', path=str(directory), high_water=meta.get('high_water'))
+            return False
+
+        self.row_ids = array('q', row_ids.tobytes())
+        self.high_water = int(meta['high_water'])
+        self.stale_rows = 0
+        self.snapshot_dirty = False
+        json_log(
+            self.logger,
+            'faiss_snapshot_loaded',
+            total=self.index.ntotal,
+            high_water=self.high_water,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        return True
+
+    def _snapshot_probe(self) -> list[list[Any]]:
+        # (id, link) для равномерной выборки позиций и для high_water
+        probe_ids = {self.high_water} if self.high_water else set()
+        if self.row_ids:
+            step = max(len(self.row_ids) // SNAPSHOT_PROBE_ROWS, 1)
+            probe_ids.update(self.row_ids[position] for position in range(0, len(self.row_ids), step))
+            probe_ids.add(self.row_ids[-1])
+        texts = self.fetch_texts(sorted(probe_ids))
+        return [[row_id, texts[row_id][0]] for row_id in sorted(probe_ids) if row_id in texts]
+
+    def _probe_matches(self, probe: list[list[Any]]) -> bool:
+        texts = self.fetch_texts([row_id for row_id, _ in probe])
+        return all(texts.get(row_id, (None,))[0] == link for row_id, link in probe)
+
+    async def check_batch(
         self,
-        title: str,
-        lead: str,
+        items: Sequence[tuple[str, str, str, str]],
+        recent_entries: list[dict[str, Any]],
         threshold_faiss: float = 0.9,
         threshold_cross: float = 0.9,
         llm_min: float = 0.8,
-    ) -> bool:
-        if not title or not lead:
-            json_log(self.logger, 'duplicate_skip_empty')
-            return False
-        if self.faiss_index is None or self.faiss_index.ntotal == 0:
-            json_log(self.logger, 'duplicate_skip_empty_faiss')
-            return False
+    ) -> list[DedupVerdict]:
+        # items — (link, source, title, lead); один encode на весь батч, один поиск FAISS, один predict
+        if not items:
+            return []
+        texts = [f'{title.strip()} {lead.strip()}'.lower() for _, _, title, lead in items]
+        verdicts = [DedupVerdict(link=link, text=text) for (link, _, _, _), text in zip(items, texts)]
+        if self.lexical is not None:
+            await self._lexical_stage(verdicts)
 
-        text = f'{title.strip()} {lead.strip()}'.lower()
-        embedding = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
-        distances, indices = self.faiss_index.search(np.expand_dims(embedding, axis=0), k=self.faiss_index.ntotal)
+        # кодируем только то, что не отсеял лексический фильтр; остальные строки остаются нулевыми
+        encoded = [row for row, verdict in enumerate(verdicts) if not verdict.is_duplicate]
+        embeddings = np.zeros((len(verdicts), self.index.dimension), dtype='float32')
+        if encoded:
+            embeddings[encoded] = await self.executor.encode([texts[row] for row in encoded], normalize=True)
+        for row in encoded:
+            verdicts[row].embedding = embeddings[row]
 
-        cross_candidates: list[tuple[str, str, float]] = []
-        for score, idx in zip(distances[0], indices[0]):
-            if idx >= len(self.faiss_texts):
+        # статьи одного батча ещё не в индексе: склеиваем одно событие из разных источников
+        # и дальше по истории проверяем только представителя кластера
+        # представителем становится статья приоритетного источника; дубли лексического фильтра не участвуют
+        order = sorted(encoded, key=lambda row: (self.source_rank.get(items[row][1], len(self.source_rank)), row))
+        clusters = _cluster(embeddings, self.cluster_threshold, order)
+        for representative, members in clusters:
+            if len(members) == 1:
                 continue
-            score = float(score)
-            top_link, top_text = self.faiss_texts[idx]
-            json_log(self.logger, 'faiss_compare', link=top_link, score=round(score, 4))
-            if score >= threshold_faiss:
-                json_log(self.logger, 'duplicate_by_faiss', link=top_link, score=round(score, 4))
-                return True
-            cross_candidates.append((top_link, top_text, score))
-
-        if not cross_candidates:
-            return False
+            for row in members:
+                if row == representative:
+                    continue
+                score = float(embeddings[row] @ embeddings[representative])
+                verdicts[row].mark('batch_cluster', verdicts[representative].link, score)
+            verdicts[representative].evidence['cluster'] = [verdicts[row].link for row in members if row != representative]
+        json_log(
+            self.logger,
+            'dedup_batch_clusters',
+            batch_size=len(items),
+            clusters=len(clusters),
+            clustered=sum(len(members) for _, members in clusters if len(members) > 1),
+        )
+
+        cross_candidates: list[list[tuple[str, str, float]]] = [[] for _ in verdicts]
+        pending = [row for row, verdict in enumerate(verdicts) if not verdict.is_duplicate]
+        # сначала решаем по одним скорам, тексты читаем из базы только для нужных id
+        faiss_hits: dict[int, tuple[int, float]] = {}
+        candidate_ids: list[list[tuple[int, float]]] = [[] for _ in verdicts]
+        if pending and self.index.ntotal > 0:
+            # вышедшие из окна строки ещё могут занимать места в топе, берём с запасом
+            k = self.top_k + min(self.stale_rows, self.top_k)
+            distances, indices = self.index.search(embeddings[pending], k=k, min_score=self.min_score)
+            for position, row in enumerate(pending):
+                for score, idx in zip(distances[position], indices[position]):
+                    if idx < 0 or idx >= len(self.row_ids) or self.row_ids[idx] < self.min_row_id:
+                        continue
+                    score = float(score)
+                    if score >= threshold_faiss:
+                        faiss_hits[row] = (self.row_ids[idx], score)
+                        break
+                    if len(candidate_ids[row]) < 5:
+                        candidate_ids[row].append((self.row_ids[idx], score))
+
+        needed = {row_id for row_id, _ in faiss_hits.values()}
+        needed.update(row_id for candidates in candidate_ids for row_id, _ in candidates)
+        texts = await asyncio.to_thread(self.fetch_texts, sorted(needed)) if needed else {}
+        for row, (row_id, score) in faiss_hits.items():
+            verdicts[row].mark('faiss', texts.get(row_id, (f'#{row_id}', ''))[0], score)
+        for row, candidates in enumerate(candidate_ids):
+            cross_candidates[row] = [
+                (*texts[row_id], score) for row_id, score in candidates if row_id in texts
+            ]
+            if row in pending:
+                verdicts[row].evidence['faiss_top'] = [
+                    [top_link, round(score, 4)] for top_link, _, score in cross_candidates[row]
+                ]
+
+        # статьи батча ещё не в индексе и не в окне последних: более ранние члены батча
+        # проверяются кросс-энкодером и LLM так же, как кандидаты из истории
+        similarity = embeddings @ embeddings.T
+        for row in pending:
+            if verdicts[row].is_duplicate:
+                continue
+            peers = sorted(
+                (
+                    (float(similarity[row, other]), other)
+                    for other in pending
+                    if other < row and not verdicts[other].is_duplicate and similarity[row, other] >= self.min_score
+                ),
+                reverse=True,
+            )[:5]
+            if not peers:
+                continue
+            verdicts[row].evidence['batch_top'] = [[verdicts[other].link, round(score, 4)] for score, other in peers]
+            if peers[0][0] >= threshold_faiss:
+                verdicts[row].mark('faiss', verdicts[peers[0][1]].link, peers[0][0])
+                continue
+            cross_candidates[row].extend((verdicts[other].link, verdicts[other].text, score) for score, other in peers)
+
+        pairs: list[tuple[str, str]] = []
+        owners: list[tuple[int, str, str]] = []
+        for row, verdict in enumerate(verdicts):
+            if verdict.is_duplicate:
+                continue
+            for top_link, top_text, _ in cross_candidates[row]:
+                pairs.append((verdict.text, top_text))
+                owners.append((row, top_link, top_text))
+
+        llm_candidates: list[list[tuple[str, str, float]]] = [[] for _ in verdicts]
+        if pairs:
+            cross_scores = await self.executor.predict(pairs)
+            for (row, top_link, top_text), cross_score in zip(owners, cross_scores):
+                cross_score = float(cross_score)
+                verdict = verdicts[row]
+                verdict.evidence.setdefault('cross', []).append([top_link, round(cross_score, 4)])
+                if verdict.is_duplicate:
+                    continue
+                if cross_score >= threshold_cross:
+                    verdict.mark('cross', top_link, cross_score)
+                elif cross_score >= llm_min:
+                    llm_candidates[row].append((top_link, top_text, cross_score))
+
+        # LLM-проверки всех статей батча идут одновременно, параллелизм ограничивает LLMClient;
+        # окно последних сдвигается на более ранние уникальные статьи батча, как если бы они уже были сохранены
+        batch_entries = [
+            (row, {'link': verdict.link, 'text': verdict.text})
+            for row, verdict in enumerate(verdicts)
+            if not verdict.is_duplicate
+        ]
+        llm_rows = [row for row, verdict in enumerate(verdicts) if not verdict.is_duplicate]
+        results = await asyncio.gather(
+            *(
+                self._llm_stage(verdicts[row], llm_candidates[row], self._recent_with_batch(recent_entries, batch_entries, row))
+                for row in llm_rows
+            ),
+            return_exceptions=True,
+        )
+        for row, result in zip(llm_rows, results):
+            # сбой одной статьи не роняет батч: она откладывается до следующего опроса
+            if isinstance(result, Exception):
+                json_log(self.logger, 'llm_stage_error', link=verdicts[row].link, error=repr(result))
+                verdicts[row].defer('llm_error')
+            elif isinstance(result, BaseException):
+                raise result
+
+        if self.llm_cache is not None:
+            self.llm_cache.report()
+        self.stage_counts['checked'] += len(verdicts)
+        self.stage_counts.update(verdict.stage for verdict in verdicts)
+        checked = self.stage_counts['checked']
+        json_log(
+            self.logger,
+            'dedup_stage_stats',
+            checked=checked,
+            hit_rates={
+                stage: round(count / checked, 4)
+                for stage, count in self.stage_counts.items()
+                if stage != 'checked'
+            },
+        )
+        for verdict in verdicts:
+            json_log(
+                self.logger,
+                'dedup_verdict',
+                link=verdict.link,
+                duplicate=verdict.is_duplicate,
+                deferred=verdict.deferred,
+                stage=verdict.stage,
+                matched_link=verdict.matched_link,
+                score=round(verdict.score, 4) if verdict.score is not None else None,
+                evidence=verdict.evidence,
+            )
+        return verdicts
+
+    @staticmethod
+    def _recent_with_batch(
+        recent_entries: list[dict[str, Any]],
+        batch_entries: list[tuple[int, dict[str, Any]]],
+        row: int,
+    ) -> list[dict[str, Any]]:
+        earlier = [entry for other, entry in batch_entries if other < row]
+        return recent_entries[len(earlier):] + earlier
+
+    async def _lexical_stage(self, verdicts: list[DedupVerdict]) -> None:
+        assert self.lexical is not None
+        hits: dict[int, tuple[int, float]] = {}
+        for row, verdict in enumerate(verdicts):
+            verdict.signature = self.lexical.signature(verdict.text)
+            matches = self.lexical.query(verdict.signature)
+            verdict.evidence['minhash'] = round(matches[0][1], 4) if matches else None
+            if matches and matches[0][1] >= self.lexical_threshold:
+                hits[row] = matches[0]
+        if not hits:
+            return
+        texts = await asyncio.to_thread(self.fetch_texts, sorted({row_id for row_id, _ in hits.values()}))
+        for row, (row_id, jaccard) in hits.items():
+            verdicts[row].mark('minhash', texts.get(row_id, (f'#{row_id}', ''))[0], jaccard)
 
-        llm_candidates: list[tuple[str, str, float]] = []
-        for top_link, top_text, faiss_score in sorted(cross_candidates, key=lambda x: x[2], reverse=True)[:5]:
-            cross_score = float(self.cross_model.predict([(text, top_text)])[0])
-            json_log(self.logger, 'cross_compare', link=top_link, score=round(cross_score, 4))
-            if cross_score >= threshold_cross:
-                json_log(self.logger, 'duplicate_by_cross', link=top_link, score=round(cross_score, 4))
-                return True
-            if llm_min <= cross_score < threshold_cross:
-                llm_candidates.append((top_link, top_text, cross_score))
-
-        for top_link, top_text, cross_score in sorted(llm_candidates, key=lambda x: x[2], reverse=True)[:2]:
-            llm_result = self.llm_check(text, top_text)
-            json_log(self.logger, 'llm_compare', link=top_link, cross_score=round(cross_score, 4), result=llm_result)
-            if llm_result:
-                json_log(self.logger, 'duplicate_by_llm', link=top_link)
-                return True
-        return False
-
-    def llm_check(self, text1: str, text2: str) -> bool:
-        if not self.openrouter_api_key:
+    async def _llm_stage(
+        self,
+        verdict: DedupVerdict,
+        candidates: list[tuple[str, str, float]],
+        recent_entries: list[dict[str, Any]],
+    ) -> None:
+        top = sorted(candidates, key=lambda x: x[2], reverse=True)[:2]
+        top_scores = {top_link: score for top_link, _, score in top}
+        if self.llm_batch_verify and self.llm is not None:
+            # один запрос на статью: топ кросс-энкодера и окно последних статей одним списком
+            merged = dict((top_link, top_text) for top_link, top_text, _ in top)
+            for entry in recent_entries:
+                merged.setdefault(entry.get('link', ''), entry.get('text', ''))
+            matched_link, undecided = await self.llm_match_candidates(verdict.text, list(merged.items()), 'llm_multi_compare')
+        else:
+            matched_link, undecided = await self.llm_first_match(
+                verdict.text,
+                [(top_link, top_text) for top_link, top_text, _ in top],
+                'llm_compare',
+            )
+            if matched_link is None:
+                matched_link, last_undecided = await self.llm_check_last_10(verdict.text, recent_entries)
+                undecided += last_undecided
+
+        if matched_link in top_scores:
+            verdict.mark('llm', matched_link, top_scores[matched_link])
+        elif matched_link is not None:
+            verdict.mark('llm_last10', matched_link)
+        elif undecided:
+            self._llm_undecided(verdict, undecided, top_scores)
+
+    def _llm_undecided(self, verdict: DedupVerdict, undecided: list[str], top_scores: dict[str, float]) -> None:
+        # модель не ответила: по кандидату, которого кросс-энкодер уже поднял выше llm_min, решение
+        # откладывается до следующего опроса; для окна последних статей других улик нет, и статья проходит,
+        # иначе сбой LLM остановил бы публикацию
+        verdict.evidence['llm_unknown'] = undecided
+        flagged = [link for link in undecided if link in top_scores]
+        json_log(self.logger, 'llm_verdict_unknown', link=verdict.link, undecided=undecided, deferred=bool(flagged))
+        if flagged:
+            verdict.defer('llm_unknown', flagged[0], top_scores[flagged[0]])
+
+    async def llm_match_candidates(
+        self,
+        text: str,
+        candidates: Sequence[tuple[str, str]],
+        event: str,
+    ) -> tuple[str | None, list[str]]:
+        # новая статья против пронумерованного списка кандидатов в одном запросе;
+        # если ответ пришёл, но не разобран — откатываемся на попарные проверки,
+        # если не пришёл вовсе — все кандидаты остаются без решения
+        assert self.llm is not None
+        candidates = [(link, candidate_text) for link, candidate_text in candidates if candidate_text]
+        keys = [pair_key(self.llm.model, text, candidate_text) for _, candidate_text in candidates]
+        if self.llm_cache is not None:
+            cached = [await asyncio.to_thread(self.llm_cache.get, key) for key in keys]
+            for (link, _), verdict in zip(candidates, cached):
+                if verdict:
+                    return link, []
+            unresolved = [position for position, verdict in enumerate(cached) if verdict is None]
+        else:
+            unresolved = list(range(len(candidates)))
+        # все пары уже посмотрены в кеше, попарный откат идёт мимо него
+        if len(unresolved) <= 1:
+            return await self.llm_first_match(text, [candidates[position] for position in unresolved], event, use_cache=False)
+
+        started = time.perf_counter()
+        answer = await self.llm.complete(build_multi_prompt(text, [candidates[position][1] for position in unresolved]))
+        if answer is None:
+            # сбой, таймаут или неповторяемый статус: попарные запросы ушли бы в тот же недоступный сервер
+            json_log(self.logger, 'llm_multi_failed', stage=event, candidates=len(unresolved))
+            return None, [candidates[position][0] for position in unresolved]
+        matches = parse_multi_answer(answer, len(unresolved))
+        if matches is None:
+            json_log(self.logger, 'llm_multi_unparsed', stage=event, answer=answer, candidates=len(unresolved))
+            return await self.llm_first_match(text, [candidates[position] for position in unresolved], event, use_cache=False)
+
+        json_log(self.logger, event, candidates=len(unresolved), matches=[candidates[unresolved[i]][0] for i in matches])
+        if self.llm_cache is not None:
+            # время запроса делим поровну между парами, которые он заменил
+            latency = (time.perf_counter() - started) / len(unresolved)
+            for number, position in enumerate(unresolved):
+                await asyncio.to_thread(self.llm_cache.put, keys[position], number in matches, latency)
+        return (candidates[unresolved[matches[0]]][0] if matches else None), []
+
+    async def llm_check(self, text1: str, text2: str) -> bool | None:
+        # None — модель не ответила, вердикт неизвестен
+        if self.llm is None:
             json_log(self.logger, 'llm_disabled_no_key')
             return False
-        prompt = (
-            'Ты профессиональный редактор автомобильных новостей. Твоя задача: определить, описывают ли эти два текста ' 
-            'одно и то же событие, даже если слова и формулировки разные. Ответь только Да или Нет, без пояснений.\n\n'
-            f'Текст 1:\n{text1}\n\nТекст 2:\n{text2}'
-        )
-        headers = {
-            'Authorization': f'Bearer {self.openrouter_api_key}',
-            'Content-Type': 'application/json',
-        }
-        data = {
-            'model': 'qwen/qwen3.6-plus-preview:free',
-            'messages': [{'role': 'user', 'content': prompt}],
+        if self.llm_cache is not None:
+            cached = await asyncio.to_thread(self.llm_cache.get, pair_key(self.llm.model, text1, text2))
+            if cached is not None:
+                return cached
+        return await self._llm_check_uncached(text1, text2)
+
+    async def _llm_check_uncached(self, text1: str, text2: str) -> bool | None:
+        # запрос к модели без чтения кеша: вызывающий уже посмотрел пару в кеше, повторный get исказил бы статистику
+        assert self.llm is not None
+        key = pair_key(self.llm.model, text1, text2)
+        started = time.perf_counter()
+        answer = await self.llm.complete(build_pair_prompt(text1, text2))
+        if answer is None:
+            # сбои не кешируем, чтобы пара проверилась заново
+            return None
+        answer = answer.lower()
+        json_log(self.logger, 'llm_response', answer=answer)
+        verdict = 'да' in answer
+        if self.llm_cache is not None:
+            await asyncio.to_thread(self.llm_cache.put, key, verdict, time.perf_counter() - started)
+        return verdict
+
+    async def llm_first_match(
+        self,
+        text: str,
+        candidates: Sequence[tuple[str, str]],
+        event: str,
+        use_cache: bool = True,
+    ) -> tuple[str | None, list[str]]:
+        # все сравнения идут параллельно; первое «да» отменяет оставшиеся запросы.
+        # Возвращает совпавшую ссылку и ссылки, по которым модель так и не ответила
+        check = self.llm_check if use_cache else self._llm_check_uncached
+        tasks = {
+            asyncio.create_task(check(text, candidate_text)): link
+            for link, candidate_text in candidates
+            if candidate_text
         }
+        pending = set(tasks)
+        undecided: list[str] = []
         try:
-            response = requests.post(
-                'https://openrouter.ai/api/v1/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=30,
-            )
-            if response.status_code != 200:
-                json_log(self.logger, 'llm_error', status_code=response.status_code, body=response.text[:300])
-                return False
-            answer = response.json()['choices'][0]['message']['content'].strip().lower()
-            json_log(self.logger, 'llm_response', answer=answer)
-            return 'да' in answer
-        except Exception as exc:
-            json_log(self.logger, 'llm_exception', error=str(exc))
-            return False
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    json_log(self.logger, event, link=tasks[task], result=result)
+                    if result is None:
+                        undecided.append(tasks[task])
+                    elif result:
+                        return tasks[task], []
+            return None, undecided
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                json_log(self.logger, 'llm_cancelled', stage=event, cancelled=len(pending))
+                await asyncio.gather(*pending, return_exceptions=True)
 
-    def llm_check_last_10(self, text: str, published_data: list[dict[str, Any]]) -> bool:
-        if not self.openrouter_api_key:
+    async def llm_check_last_10(self, text: str, recent_entries: list[dict[str, Any]]) -> tuple[str | None, list[str]]:
+        if self.llm is None:
             json_log(self.logger, 'llm_last10_disabled_no_key')
-            return False
-        recent_entries = published_data[-10:]
-        for entry in recent_entries:
-            top_link = entry.get('link', '')
-            top_text = entry.get('text', '')
-            if not top_text:
-                continue
-            llm_result = self.llm_check(text, top_text)
-            json_log(self.logger, 'llm_last10_compare', link=top_link, result=llm_result)
-            if llm_result:
-                json_log(self.logger, 'duplicate_by_llm_last10', link=top_link)
-                return True
-        return False
+            return None, []
+        # окно последних статей ведёт PublishedStorage.recent_articles
+        matched_link, undecided = await self.llm_first_match(
+            text,
+            [(entry.get('link', ''), entry.get('text', '')) for entry in recent_entries],
+            'llm_last10_compare',
+        )
+        if matched_link is not None:
+            json_log(self.logger, 'duplicate_by_llm_last10', link=matched_link)
+        return matched_link, undecided
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import numpy as np
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from logging_utils import json_log
+
+T = TypeVar('T')
+
+# у каждого потока (или процесса) пула свои экземпляры моделей, загруженные один раз
+_worker_state = threading.local()
+
+
+def _load_models(embedding_model_name: str, cross_model_name: str) -> None:
+    _worker_state.model = SentenceTransformer(embedding_model_name)
+    _worker_state.cross_model = CrossEncoder(cross_model_name)
+
+
+def _encode(texts: list[str], normalize: bool) -> np.ndarray:
+    return _worker_state.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+
+
+def _predict(pairs: list[tuple[str, str]]) -> np.ndarray:
+    return np.asarray(_worker_state.cross_model.predict(pairs))
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        embedding_model_name: str,
+        cross_model_name: str,
+        workers: int = 1,
+        max_pending: int = 32,
+        use_processes: bool = False,
+    ):
+        self.logger = logger
+        self.embedding_model_name = embedding_model_name
+        self.cross_model_name = cross_model_name
+        self.workers = workers
+        self.use_processes = use_processes
+        self._pool: Executor | None = None
+        # ограничение очереди: лишние запросы ждут здесь, а не копятся внутри пула
+        self._pending = asyncio.Semaphore(max_pending)
+
+    async def start(self) -> None:
+        initargs = (self.embedding_model_name, self.cross_model_name)
+        if self.use_processes:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_load_models,
+                initargs=initargs,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='inference',
+                initializer=_load_models,
+                initargs=initargs,
+            )
+        # первый вызов в каждом воркере запускает загрузку моделей
+        await asyncio.gather(*(self.encode(['прогрев']) for _ in range(self.workers)))
+        json_log(self.logger, 'inference_ready', workers=self.workers, processes=self.use_processes)
+
+    async def _submit(self, func: Callable[..., T], *args: Any) -> T:
+        if self._pool is None:
+            raise RuntimeError('InferenceExecutor не запущен')
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+
+    async def encode(self, texts: Sequence[str], normalize: bool = False) -> np.ndarray:
+        return await self._submit(_encode, list(texts), normalize)
+
+    async def predict(self, pairs: Sequence[tuple[str, str]]) -> np.ndarray:
+        return await self._submit(_predict, list(pairs))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
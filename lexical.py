@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import logging
+import os
+import re
+import time
+from array import array
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from logging_utils import json_log
+
+# простое число Мерсенна: (a * h + b) для 32-битных h и a, b < P помещается в uint64
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_WORD_RE = re.compile(r'\w+')
+# сигнатура текста без шинглов; такие тексты в индекс не попадают и ни с чем не совпадают
+_EMPTY_HASH = np.iinfo(np.uint32).max
+
+MINHASH_FORMAT_VERSION = 1
+# хеш полосы: значения полосы сворачиваются в одно 64-битное число (FNV-подобно, по модулю 2^64)
+_BAND_MULTIPLIER = np.uint64(0x100000001B3)
+# новые строки копятся в несортированном хвосте и вливаются в отсортированные массивы,
+# когда хвост дорастает до этого размера или до 1/8 уже отсортированных строк
+_TAIL_MERGE_ROWS = 256
+# по сколько строк считать хеши полос при пересборке, чтобы не раздувать временные массивы
+_HASH_CHUNK_ROWS = 65536
+
+
+def shingles(text: str, size: int) -> set[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[start:start + size]) for start in range(len(words) - size + 1)}
+
+
+class MinHashIndex:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+        compact_fraction: float = 0.25,
+    ):
+        if num_perm % bands:
+            raise ValueError('num_perm должно делиться на bands')
+        self.logger = logger
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        # всё хранится плоскими массивами чисел, без объекта Python на строку или полосу
+        self._row_ids = array('q')
+        # сигнатуры подряд, по num_perm значений на строку
+        self._signatures = array('I')
+        # по каждой полосе отсортированные хеши и позиции строк в _row_ids
+        self._sorted_keys = np.empty((bands, 0), dtype=np.uint64)
+        self._sorted_positions = np.empty((bands, 0), dtype=np.int32)
+        # хеши полос строк с позиции _tail_start, ещё не влитые в отсортированные массивы
+        self._tail_keys = array('Q')
+        self._tail_start = 0
+        self.high_water = 0
+        # строки с id меньше min_row_id вышли из окна и не находятся, но удаляются из массивов
+        # только когда их доля дорастёт до compact_fraction
+        self.min_row_id = 0
+        self.compact_fraction = compact_fraction
+
+    def __len__(self) -> int:
+        return len(self._row_ids)
+
+    def signature(self, text: str) -> np.ndarray:
+        tokens = shingles(text, self.shingle_size)
+        if not tokens:
+            return np.full(self.num_perm, _EMPTY_HASH, dtype=np.uint32)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little') for token in tokens),
+            dtype=np.uint64,
+            count=len(tokens),
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def query(self, signature: np.ndarray) -> list[tuple[int, float]]:
+        # кандидаты из совпавших LSH-полос с оценкой Жаккара, по убыванию
+        if _is_empty(signature):
+            return []
+        keys = self._band_hashes(signature.reshape(1, -1))[0]
+        positions: set[int] = set()
+        for band in range(self.bands):
+            band_keys = self._sorted_keys[band]
+            left, right = np.searchsorted(band_keys, keys[band], 'left'), np.searchsorted(band_keys, keys[band], 'right')
+            positions.update(self._sorted_positions[band, left:right].tolist())
+        if self._tail_keys:
+            tail = np.frombuffer(self._tail_keys, dtype=np.uint64).reshape(-1, self.bands)
+            positions.update((self._tail_start + np.flatnonzero((tail == keys).any(axis=1))).tolist())
+        signatures = self._signature_matrix()
+        scored = [
+            (self._row_ids[position], float(np.mean(signatures[position] == signature)))
+            for position in positions
+            if self._row_ids[position] >= self.min_row_id
+        ]
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def add(self, row_id: int, signature: np.ndarray) -> None:
+        self._extend([row_id], signature.reshape(1, -1))
+
+    def add_texts(self, rows: Iterable[tuple[int, str]], chunk_size: int = 10000) -> int:
+        started = time.perf_counter()
+        count = 0
+        row_ids: list[int] = []
+        signatures: list[np.ndarray] = []
+        for row_id, text in rows:
+            row_ids.append(row_id)
+            signatures.append(self.signature(text or ''))
+            count += 1
+            if len(row_ids) >= chunk_size:
+                self._extend(row_ids, np.vstack(signatures))
+                row_ids, signatures = [], []
+        if row_ids:
+            self._extend(row_ids, np.vstack(signatures))
+        json_log(
+            self.logger,
+            'minhash_index_extended',
+            rows=count,
+            total=len(self),
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        return count
+
+    def evict(self, min_row_id: int | None = None, max_rows: int | None = None) -> int:
+        # позиции идут по возрастанию id, поэтому окно — это порог min_row_id
+        if min_row_id is not None:
+            self.min_row_id = max(self.min_row_id, min_row_id)
+        if max_rows is not None and len(self._row_ids) > max_rows:
+            self.min_row_id = max(self.min_row_id, self._row_ids[len(self._row_ids) - max_rows])
+        stale = bisect.bisect_left(self._row_ids, self.min_row_id)
+        if not stale or stale < self.compact_fraction * len(self._row_ids):
+            return 0
+        self._rebuild(np.frombuffer(self._row_ids, dtype=np.int64)[stale:], self._signature_matrix()[stale:])
+        json_log(self.logger, 'minhash_index_evicted', evicted=stale, total=len(self))
+        return stale
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_name(path.name + '.tmp')
+        with tmp_path.open('wb') as fh:
+            np.savez(
+                fh,
+                meta=np.array([MINHASH_FORMAT_VERSION, self.num_perm, self.bands, self.shingle_size, self.seed, self.high_water], dtype=np.int64),
+                row_ids=np.frombuffer(self._row_ids, dtype=np.int64),
+                signatures=self._signature_matrix(),
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: Path) -> bool:
+        # False — файла нет, он повреждён или собран с другими параметрами
+        try:
+            with np.load(path) as data:
+                meta = data['meta'].tolist()
+                row_ids = data['row_ids']
+                signatures = data['signatures']
+        except FileNotFoundError:
+            return False
+        except Exception as exc:
+            json_log(self.logger, 'minhash_snapshot_corrupt', path=str(path), error=str(exc))
+            return False
+        expected = [MINHASH_FORMAT_VERSION, self.num_perm, self.bands, self.shingle_size, self.seed]
+        if meta[:5] != expected or len(row_ids) != len(signatures):
+            json_log(self.logger, 'minhash_snapshot_mismatch', path=str(path))
+            return False
+        self._rebuild(row_ids, signatures)
+        self.high_water = int(meta[5])
+        json_log(self.logger, 'minhash_snapshot_loaded', total=len(self), high_water=self.high_water)
+        return True
+
+    def _extend(self, row_ids: Sequence[int], signatures: np.ndarray) -> None:
+        if len(row_ids):
+            self.high_water = max(self.high_water, max(row_ids))
+        # тексты без шинглов в индекс не попадают
+        keep = ~(signatures == _EMPTY_HASH).all(axis=1)
+        if not keep.any():
+            return
+        signatures = np.ascontiguousarray(signatures[keep], dtype=np.uint32)
+        self._row_ids.frombytes(np.asarray(row_ids, dtype=np.int64)[keep].tobytes())
+        self._signatures.frombytes(signatures.tobytes())
+        self._tail_keys.frombytes(self._band_hashes(signatures).tobytes())
+        tail_rows = len(self._tail_keys) // self.bands
+        if tail_rows >= max(_TAIL_MERGE_ROWS, self._tail_start // 8):
+            self._merge_tail()
+
+    def _merge_tail(self) -> None:
+        # хвост маленький: сортируем только его и вставляем в каждую полосу за один проход
+        tail = np.frombuffer(self._tail_keys, dtype=np.uint64).reshape(-1, self.bands).T
+        tail_positions = np.arange(self._tail_start, self._tail_start + tail.shape[1], dtype=np.int32)
+        keys, positions = [], []
+        for band in range(self.bands):
+            order = np.argsort(tail[band], kind='stable')
+            band_keys = tail[band][order]
+            at = np.searchsorted(self._sorted_keys[band], band_keys, 'right')
+            keys.append(np.insert(self._sorted_keys[band], at, band_keys))
+            positions.append(np.insert(self._sorted_positions[band], at, tail_positions[order]))
+        del tail
+        self._sorted_keys = np.vstack(keys)
+        self._sorted_positions = np.vstack(positions)
+        self._tail_start += len(tail_positions)
+        self._tail_keys = array('Q')
+
+    def _rebuild(self, row_ids: np.ndarray, signatures: np.ndarray) -> None:
+        keep = ~(signatures == _EMPTY_HASH).all(axis=1) if len(signatures) else np.zeros(0, dtype=bool)
+        signatures = np.ascontiguousarray(signatures[keep], dtype=np.uint32)
+        row_ids = np.asarray(row_ids, dtype=np.int64)[keep]
+        keys = np.vstack(
+            [self._band_hashes(signatures[start:start + _HASH_CHUNK_ROWS]) for start in range(0, len(signatures), _HASH_CHUNK_ROWS)]
+            or [np.empty((0, self.bands), dtype=np.uint64)]
+        ).T
+        order = np.argsort(keys, axis=1, kind='stable')
+        self._sorted_keys = np.take_along_axis(keys, order, axis=1)
+        self._sorted_positions = order.astype(np.int32)
+        self._row_ids = array('q', row_ids.tobytes())
+        self._signatures = array('I', signatures.tobytes())
+        self._tail_keys = array('Q')
+        self._tail_start = len(row_ids)
+
+    def _signature_matrix(self) -> np.ndarray:
+        return np.frombuffer(self._signatures, dtype=np.uint32).reshape(-1, self.num_perm)
+
+    def _band_hashes(self, signatures: np.ndarray) -> np.ndarray:
+        # (строки, num_perm) uint32 -> (строки, bands) uint64
+        blocks = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.rows_per_band)
+        hashes = np.zeros(blocks.shape[:2], dtype=np.uint64)
+        for column in range(self.rows_per_band):
+            hashes = hashes * _BAND_MULTIPLIER + blocks[:, :, column]
+        return hashes
+
+
+def _is_empty(signature: np.ndarray) -> bool:
+    return bool((signature == _EMPTY_HASH).all())
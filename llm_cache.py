@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from logging_utils import json_log
+
+# чистка просроченных и лишних записей раз в столько вставок
+PRUNE_EVERY = 200
+
+
+def pair_key(model: str, text1: str, text2: str) -> str:
+    # пара симметрична: «A дубль B» и «B дубль A» — один и тот же вопрос
+    first, second = sorted(' '.join(text.lower().split()) for text in (text1, text2))
+    digest = hashlib.sha256()
+    for part in (model, first, second):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class LLMVerdictCache:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        db_path: Path,
+        ttl_seconds: int,
+        max_entries: int,
+        memory_entries: int = 2048,
+    ):
+        self.logger = logger
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        # key -> (verdict, latency_seconds, created_at)
+        self._memory: OrderedDict[str, tuple[bool, float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA busy_timeout=30000')
+        self._conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS llm_verdicts (
+                key TEXT PRIMARY KEY,
+                verdict INTEGER NOT NULL,
+                latency_seconds REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+            '''
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_verdicts_created_at ON llm_verdicts(created_at)')
+        self._conn.commit()
+        self._puts = 0
+        self.stats: Counter[str] = Counter()
+        self.saved_seconds = 0.0
+
+    def get(self, key: str) -> bool | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                source = 'memory_hit'
+            else:
+                row = self._conn.execute(
+                    'SELECT verdict, latency_seconds, created_at FROM llm_verdicts WHERE key = ?',
+                    (key,),
+                ).fetchone()
+                entry = (bool(row[0]), row[1], row[2]) if row else None
+                source = 'disk_hit'
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is None or now - entry[2] > self.ttl_seconds:
+                self._memory.pop(key, None)
+                self.stats['miss'] += 1
+                return None
+            self.stats[source] += 1
+            self.saved_seconds += entry[1]
+            return entry[0]
+
+    def put(self, key: str, verdict: bool, latency_seconds: float) -> None:
+        entry = (verdict, latency_seconds, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_verdicts (key, verdict, latency_seconds, created_at) VALUES (?, ?, ?, ?)',
+                (key, int(verdict), latency_seconds, entry[2]),
+            )
+            self._puts += 1
+            if self._puts % PRUNE_EVERY == 0:
+                self._prune(entry[2])
+            self._conn.commit()
+
+    def report(self) -> None:
+        lookups = sum(self.stats.values())
+        hits = self.stats['memory_hit'] + self.stats['disk_hit']
+        json_log(
+            self.logger,
+            'llm_cache_stats',
+            lookups=lookups,
+            hit_rate=round(hits / lookups, 3) if lookups else None,
+            outcomes=dict(self.stats),
+            saved_seconds=round(self.saved_seconds, 1),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key: str, entry: tuple[bool, float, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now: float) -> None:
+        expired = self._conn.execute('DELETE FROM llm_verdicts WHERE created_at < ?', (now - self.ttl_seconds,)).rowcount
+        overflow = self._conn.execute(
+            '''
+            DELETE FROM llm_verdicts WHERE key IN (
+                SELECT key FROM llm_verdicts ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            ''',
+            (self.max_entries,),
+        ).rowcount
+        if expired or overflow:
+            json_log(self.logger, 'llm_cache_pruned', expired=expired, overflow=overflow)
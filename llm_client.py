@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from logging_utils import json_log
+
+OPENROUTER_BASE_URL = 'https://openrouter.ai/api/v1'
+DEFAULT_LLM_MODEL = 'qwen/qwen3.6-plus-preview:free'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMClient:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        api_key: str,
+        base_url: str = OPENROUTER_BASE_URL,
+        model: str = DEFAULT_LLM_MODEL,
+        timeout_seconds: float = 30,
+        max_concurrency: int = 4,
+        max_connections: int = 8,
+        max_retries: int = 3,
+        retry_base_seconds: float = 1.0,
+    ):
+        self.logger = logger
+        self.api_key = api_key
+        # base_url настраивается, чтобы гонять клиент против локальной заглушки
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+            headers={
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json',
+            },
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def complete(self, prompt: str) -> str | None:
+        # None — ответа нет: ошибка, исчерпаны повторы или вышел срок
+        if self._session is None:
+            raise RuntimeError('LLMClient не запущен')
+        payload = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}]}
+        # общий срок на запрос вместе с повторами; отсчёт идёт с момента, когда запрос получил слот,
+        # иначе при длинной очереди проверки истекали бы, не дойдя до сервера
+        deadline: float | None = None
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout_seconds
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    status, body, retry_after = await asyncio.wait_for(self._post(payload), remaining)
+                except asyncio.TimeoutError:
+                    json_log(self.logger, 'llm_timeout', attempt=attempt, timeout_seconds=self.timeout_seconds)
+                    return None
+                except (KeyError, IndexError, TypeError, ValueError) as exc:
+                    # ответ пришёл, но не в формате chat completions — повтор не поможет
+                    json_log(self.logger, 'llm_bad_response', attempt=attempt, error=str(exc))
+                    return None
+                except aiohttp.ClientError as exc:
+                    json_log(self.logger, 'llm_exception', attempt=attempt, error=str(exc))
+                    retry_after = None
+                else:
+                    if status == 200:
+                        return body
+                    json_log(self.logger, 'llm_error', attempt=attempt, status_code=status, body=body[:300])
+                    if status not in RETRY_STATUSES:
+                        return None
+
+            if attempt == self.max_retries:
+                break
+            # пауза перед повтором — без слота, чтобы не задерживать другие запросы
+            await asyncio.sleep(min(self._retry_delay(attempt, retry_after), max(deadline - time.monotonic(), 0)))
+        return None
+
+    async def _post(self, payload: dict[str, object]) -> tuple[int, str, str | None]:
+        assert self._session is not None
+        async with self._session.post(f'{self.base_url}/chat/completions', json=payload) as response:
+            if response.status != 200:
+                return response.status, await response.text(), response.headers.get('Retry-After')
+            data = await response.json(content_type=None)
+            content = data['choices'][0]['message']['content']
+            if not isinstance(content, str):
+                # "content": null и прочие не-строки — такой же негодный ответ, как битый JSON
+                raise TypeError(f'content: {type(content).__name__}')
+            return 200, content.strip(), None
+
+    def _retry_delay(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.retry_base_seconds * 2 ** attempt + random.uniform(0, self.retry_base_seconds)
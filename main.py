@@ -1,33 +1,119 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Callable
+import logging
+import time
 
 from aiogram import Bot
-from playwright.sync_api import sync_playwright
 
+from browser import BrowserManager
+from collector import ArticleCollector, ScrapedArticle
 from config import SETTINGS
-from dedup import DuplicateDetector
+from dedup import (
+    CROSS_MODEL,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL,
+    SNAPSHOT_MINHASH_FILE,
+    DedupVerdict,
+    DuplicateDetector,
+)
+from inference import InferenceExecutor
+from lexical import MinHashIndex
+from llm_cache import LLMVerdictCache
+from llm_client import LLMClient
 from logging_utils import json_log, setup_logging
 from notifier import TelegramNotifier
-from parsers.sites import (
-    parse_auto_article,
-    parse_auto_ru,
-    parse_autostat_article,
-    parse_autostat_ru,
-    parse_avtonovostidnya_article,
-    parse_avtonovostidnya_ru,
-    parse_kolesa_article,
-    parse_kolesa_ru,
-)
+from parsers.http_fast import HttpFastPath
+from parsers.sources import SOURCES
 from queue_manager import LimitedPostQueue, PostItem
+from scheduler import PollingScheduler
 from storage import PublishedStorage
+from vector_index import VectorIndex
 
 
-logger = setup_logging(SETTINGS.log_file, SETTINGS.log_max_bytes)
-storage = PublishedStorage(SETTINGS.database_path)
-detector = DuplicateDetector(logger, SETTINGS.openrouter_api_key)
-queue = LimitedPostQueue(SETTINGS.queue_max_size)
+# воркеры инференса в режиме spawn заново импортируют этот модуль как __mp_main__,
+# поэтому логи, база, индексы и клиенты создаются в init_services(), а не при импорте
+logger: logging.Logger
+storage: PublishedStorage
+executor: InferenceExecutor
+vector_index: VectorIndex
+lexical_index: MinHashIndex | None
+llm_client: LLMClient | None
+llm_cache: LLMVerdictCache | None
+detector: DuplicateDetector
+queue: LimitedPostQueue
+
+
+def init_services() -> None:
+    global logger, storage, executor, vector_index, lexical_index, llm_client, llm_cache, detector, queue
+    logger = setup_logging(SETTINGS.log_file, SETTINGS.log_max_bytes)
+    storage = PublishedStorage(
+        SETTINGS.database_path,
+        embedding_dtype=SETTINGS.embedding_storage_dtype,
+        recent_window=SETTINGS.dedup_recent_window,
+    )
+    executor = InferenceExecutor(
+        logger,
+        EMBEDDING_MODEL,
+        CROSS_MODEL,
+        workers=SETTINGS.inference_workers,
+        max_pending=SETTINGS.inference_max_pending,
+        use_processes=SETTINGS.inference_use_processes,
+    )
+    vector_index = VectorIndex(
+        logger,
+        EMBEDDING_DIMENSION,
+        backend=SETTINGS.dedup_index_backend,
+        hnsw_m=SETTINGS.dedup_hnsw_m,
+        hnsw_ef_search=SETTINGS.dedup_hnsw_ef_search,
+        ivf_nlist=SETTINGS.dedup_ivf_nlist,
+        ivf_nprobe=SETTINGS.dedup_ivf_nprobe,
+    )
+    lexical_index = (
+        MinHashIndex(logger, num_perm=SETTINGS.minhash_permutations, bands=SETTINGS.minhash_bands)
+        if SETTINGS.dedup_lexical
+        else None
+    )
+    llm_client = (
+        LLMClient(
+            logger,
+            SETTINGS.openrouter_api_key,
+            base_url=SETTINGS.llm_base_url,
+            model=SETTINGS.llm_model,
+            timeout_seconds=SETTINGS.llm_timeout_seconds,
+            max_concurrency=SETTINGS.llm_max_concurrency,
+            max_retries=SETTINGS.llm_max_retries,
+        )
+        if SETTINGS.openrouter_api_key
+        else None
+    )
+    llm_cache = (
+        LLMVerdictCache(
+            logger,
+            SETTINGS.database_path,
+            ttl_seconds=SETTINGS.llm_cache_ttl_seconds,
+            max_entries=SETTINGS.llm_cache_max_entries,
+            memory_entries=SETTINGS.llm_cache_memory_entries,
+        )
+        if llm_client is not None
+        else None
+    )
+    detector = DuplicateDetector(
+        logger,
+        executor,
+        vector_index,
+        storage.load_texts,
+        llm_client,
+        llm_cache,
+        llm_batch_verify=SETTINGS.llm_batch_verify,
+        top_k=SETTINGS.dedup_top_k,
+        min_score=SETTINGS.dedup_min_score,
+        cluster_threshold=SETTINGS.dedup_cluster_threshold,
+        source_priority=SETTINGS.dedup_source_priority or [source.name for source in SOURCES],
+        lexical=lexical_index,
+        lexical_threshold=SETTINGS.dedup_lexical_threshold,
+    )
+    queue = LimitedPostQueue(SETTINGS.queue_max_size)
 
 
 async def publish_loop(notifier: TelegramNotifier) -> None:
@@ -47,59 +133,179 @@ async def publish_loop(notifier: TelegramNotifier) -> None:
         await asyncio.sleep(SETTINGS.publish_delay_seconds)
 
 
-def collect_articles() -> list[tuple[str, str, str, str, str]]:
-    parsed_articles: list[tuple[str, str, str, str, str]] = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-            ],
-        )
-        context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            device_scale_factor=1,
-            is_mobile=False,
-            has_touch=False,
-            locale='ru-RU',
-            timezone_id='Europe/Moscow',
-            color_scheme='light',
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
-        )
-        context.add_init_script(
-            """
-            Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-            Object.defineProperty(navigator, 'language', {get: () => 'ru-RU'});
-            Object.defineProperty(navigator, 'languages', {get: () => ['ru-RU', 'ru']});
-            Object.defineProperty(navigator, 'platform', {get: () => 'Win32'});
-            """
+async def handle_batch(articles: list[ScrapedArticle]) -> dict[str, str]:
+    # ссылка -> исход: existing / duplicate / deferred / queue_full / queued
+    outcomes: dict[str, str] = {}
+    new_links = set(await asyncio.to_thread(storage.filter_new_links, [article.link for article in articles]))
+    fresh: list[ScrapedArticle] = []
+    for article in articles:
+        if article.link not in new_links or article.link in outcomes:
+            json_log(logger, 'skip_existing_link', source=article.source, link=article.link)
+            outcomes.setdefault(article.link, 'existing')
+            continue
+        outcomes[article.link] = 'pending'
+        fresh.append(article)
+    if not fresh:
+        return outcomes
+
+    verdicts = await detector.check_batch(
+        [(article.link, article.source, article.title, article.lead) for article in fresh],
+        storage.recent_articles(),
+    )
+
+    records: list[dict[str, object]] = []
+    stored: list[DedupVerdict] = []
+    for article, verdict in zip(fresh, verdicts):
+        source, title, lead, image_url, link = article.source, article.title, article.lead, article.image_url, article.link
+        if verdict.deferred:
+            # ссылку не сохраняем: следующий опрос источника проверит статью заново
+            json_log(logger, 'skip_deferred', source=source, link=link, stage=verdict.stage, matched_link=verdict.matched_link)
+            outcomes[link] = 'deferred'
+            continue
+        if verdict.is_duplicate:
+            outcome = 'duplicate'
+            json_log(logger, 'skip_duplicate', source=source, link=link, stage=verdict.stage, matched_link=verdict.matched_link)
+        else:
+            pushed = queue.push(
+                PostItem(
+                    title=title.strip(),
+                    lead=lead[:500].strip(),
+                    image_url=image_url if image_url.startswith('http') else '',
+                    link=link,
+                    source=source,
+                )
+            )
+            if not pushed:
+                json_log(logger, 'queue_full_skip', source=source, link=link, max_size=SETTINGS.queue_max_size)
+                outcomes[link] = 'queue_full'
+                continue
+            outcome = 'queued'
+            json_log(logger, 'queued_post', source=source, link=link, queue_size=len(queue))
+
+        records.append(
+            {
+                'link': link,
+                'title': title,
+                'lead': lead,
+                'text': verdict.text,
+                'embedding': verdict.embedding,
+                'source': source,
+                'is_duplicate': verdict.is_duplicate,
+            }
         )
-        page = context.new_page()
+        stored.append(verdict)
+        outcomes[link] = outcome
+
+    # весь батч пишется одной транзакцией
+    row_ids = await asyncio.to_thread(storage.add_articles, records)
+    for verdict, row_id in zip(stored, row_ids):
+        if row_id is not None:
+            detector.remember(row_id, verdict)
+    return outcomes
 
-        sources: list[tuple[str, Callable, Callable]] = [
-            ('auto.ru', parse_auto_ru, parse_auto_article),
-            ('kolesa.ru', parse_kolesa_ru, parse_kolesa_article),
-            ('autostat.ru', parse_autostat_ru, parse_autostat_article),
-            ('avtonovostidnya.ru', parse_avtonovostidnya_ru, parse_avtonovostidnya_article),
-        ]
 
-        for source_name, links_parser, article_parser in sources:
-            links = links_parser(page, logger)
-            for link in links:
-                title, lead, image_url = article_parser(page, link, logger)
-                if title and lead:
-                    parsed_articles.append((source_name, title, lead, image_url or '', link))
+async def next_batch(channel: asyncio.Queue[ScrapedArticle]) -> list[ScrapedArticle]:
+    # ждём первую статью, затем добираем то, что успеет прийти за linger
+    batch = [await channel.get()]
+    deadline = time.monotonic() + SETTINGS.dedup_batch_linger_seconds
+    while len(batch) < SETTINGS.dedup_batch_size:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(channel.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
 
-        context.close()
-        browser.close()
-    return parsed_articles
+
+async def dedup_loop(channel: asyncio.Queue[ScrapedArticle]) -> None:
+    while True:
+        batch = await next_batch(channel)
+        try:
+            outcomes = await handle_batch(batch)
+            for article in batch:
+                json_log(
+                    logger,
+                    'article_pipeline_latency',
+                    source=article.source,
+                    link=article.link,
+                    outcome=outcomes.get(article.link),
+                    batch_size=len(batch),
+                    latency_seconds=round(time.monotonic() - article.scraped_at, 3),
+                )
+        except Exception as exc:
+            json_log(logger, 'dedup_error', links=[article.link for article in batch], error=str(exc))
+        finally:
+            for _ in batch:
+                channel.task_done()
+
+
+async def migrate_embeddings_loop() -> None:
+    # перенос старых JSON-эмбеддингов небольшими транзакциями, не мешая основному циклу
+    migrated = 0
+    while True:
+        count = await asyncio.to_thread(storage.migrate_embeddings)
+        if not count:
+            break
+        migrated += count
+        await asyncio.sleep(0.5)
+    if migrated:
+        json_log(logger, 'embeddings_migrated', rows=migrated)
+
+
+def window_min_row_id() -> int | None:
+    if not SETTINGS.dedup_window_seconds:
+        return None
+    return storage.first_id_since(SETTINGS.dedup_window_seconds)
+
+
+def evict_index() -> None:
+    detector.evict(window_min_row_id(), SETTINGS.dedup_window_max_rows or None)
+
+
+def retrain_index() -> None:
+    # пересборка IVF долгая: только вне цикла событий и когда дедупликация простаивает
+    if vector_index.needs_training():
+        vector_index.rebuild()
+        detector.snapshot_dirty = True
+
+
+def restore_lexical_index(use_snapshot: bool) -> None:
+    if lexical_index is None:
+        return
+    if use_snapshot and lexical_index.load(SETTINGS.index_snapshot_dir / SNAPSHOT_MINHASH_FILE):
+        after_id = lexical_index.high_water
+    else:
+        after_id = (window_min_row_id() or 1) - 1
+    if lexical_index.add_texts(storage.iter_texts(after_id)):
+        detector.snapshot_dirty = True
+
+
+def restore_index() -> None:
+    # снимок MinHash лежит рядом и верен только вместе со снимком FAISS, сверенным с базой
+    snapshot_loaded = detector.load_snapshot(SETTINGS.index_snapshot_dir)
+    restore_lexical_index(snapshot_loaded)
+    if snapshot_loaded:
+        detector.replay(*storage.load_embeddings(detector.high_water))
+        evict_index()
+        retrain_index()
+    else:
+        # без снимка сразу читаем только строки, попадающие в окно по времени
+        min_row_id = window_min_row_id() or 1
+        detector.build_index(*storage.load_embeddings(min_row_id - 1))
+        detector.high_water = max(detector.high_water, min_row_id - 1)
+        evict_index()
+        detector.save_snapshot(SETTINGS.index_snapshot_dir)
 
 
 async def main() -> None:
-    published = storage.load_all()
-    detector.build_index(published)
+    init_services()
+    restore_index()
+    migration_task = asyncio.create_task(migrate_embeddings_loop())
+    await executor.start()
+    if llm_client is not None:
+        await llm_client.start()
 
     bot = Bot(token=SETTINGS.telegram_token)
     notifier = TelegramNotifier(
@@ -113,65 +319,96 @@ async def main() -> None:
     await notifier.startup_message()
     publisher_task = asyncio.create_task(publish_loop(notifier))
 
-    try:
-        while True:
-            json_log(logger, 'cycle_start')
-            parsed_articles = await asyncio.to_thread(collect_articles)
-            json_log(logger, 'cycle_articles_collected', count=len(parsed_articles))
+    browser_manager = BrowserManager(
+        logger,
+        SETTINGS.browser_state_dir,
+        context_max_pages=SETTINGS.browser_context_max_pages,
+        context_max_age_seconds=SETTINGS.browser_context_max_age_seconds,
+        probe_timeout_seconds=SETTINGS.browser_probe_timeout_seconds,
+    )
+    await browser_manager.start()
+    fast_path: HttpFastPath | None = None
+    if SETTINGS.http_fast_path:
+        fast_path = HttpFastPath(
+            logger,
+            timeout_seconds=SETTINGS.http_timeout_seconds,
+            max_connections=SETTINGS.http_max_connections,
+            connections_per_host=SETTINGS.http_connections_per_host,
+        )
+        await fast_path.start()
+    collector = ArticleCollector(
+        logger,
+        browser_manager,
+        storage,
+        SOURCES,
+        max_pages=SETTINGS.scrape_max_pages,
+        source_concurrency=SETTINGS.scrape_source_concurrency,
+        block_resources=SETTINGS.scrape_block_resources,
+        listing_max_pages=SETTINGS.listing_max_pages,
+        listing_known_streak=SETTINGS.listing_known_streak,
+        breaker_failure_threshold=SETTINGS.breaker_failure_threshold,
+        breaker_base_cooldown_seconds=SETTINGS.breaker_base_cooldown_seconds,
+        breaker_max_cooldown_seconds=SETTINGS.breaker_max_cooldown_seconds,
+        fast_path=fast_path,
+    )
+    scheduler = PollingScheduler(
+        logger,
+        [source.name for source in SOURCES],
+        initial_interval_seconds=SETTINGS.cycle_sleep_seconds,
+        min_interval_seconds=SETTINGS.poll_min_seconds,
+        max_interval_seconds=SETTINGS.poll_max_seconds,
+        target_new_links=SETTINGS.poll_target_new_links,
+    )
 
-            for source, title, lead, image_url, link in parsed_articles:
-                if storage.link_exists(link):
-                    json_log(logger, 'skip_existing_link', source=source, link=link)
-                    continue
+    channel: asyncio.Queue[ScrapedArticle] = asyncio.Queue(maxsize=SETTINGS.pipeline_channel_size)
+    dedup_task = asyncio.create_task(dedup_loop(channel))
 
-                text = f'{title.strip()} {lead.strip()}'
-                embedding = detector.encode_text(text)
-                current_published = storage.load_all()
-
-                if detector.is_duplicate(title, lead) or detector.llm_check_last_10(text.lower(), current_published):
-                    storage.add_article(
-                        link=link,
-                        title=title,
-                        lead=lead,
-                        text=text.lower(),
-                        embedding=embedding,
-                        source=source,
-                        is_duplicate=True,
-                    )
-                    detector.add_embedding(link, text, embedding)
-                    json_log(logger, 'skip_duplicate', source=source, link=link)
-                    continue
+    last_snapshot = time.monotonic()
+    try:
+        while True:
+            due = scheduler.due()
+            if not due:
+                await asyncio.sleep(scheduler.seconds_until_next())
+                continue
 
-                pushed = queue.push(
-                    PostItem(
-                        title=title.strip(),
-                        lead=lead[:500].strip(),
-                        image_url=image_url if image_url.startswith('http') else '',
-                        link=link,
-                        source=source,
-                    )
-                )
-                if not pushed:
-                    json_log(logger, 'queue_full_skip', source=source, link=link, max_size=SETTINGS.queue_max_size)
+            json_log(logger, 'cycle_start', sources=due)
+            results = await collector.collect(channel, due)
+            for result in results:
+                if result.skipped and result.retry_at is not None:
+                    scheduler.postpone(result.source, result.retry_at)
                     continue
+                # ссылки, которые не разобрались, остаются «новыми» при каждом опросе и скорость не отражают
+                scheduler.record(result.source, result.articles, result.error)
+            json_log(logger, 'cycle_articles_collected', count=sum(result.articles for result in results))
 
-                storage.add_article(
-                    link=link,
-                    title=title,
-                    lead=lead,
-                    text=text.lower(),
-                    embedding=embedding,
-                    source=source,
-                    is_duplicate=False,
-                )
-                detector.add_embedding(link, text, embedding)
-                json_log(logger, 'queued_post', source=source, link=link, queue_size=len(queue))
-
-            json_log(logger, 'cycle_complete', sleep_seconds=SETTINGS.cycle_sleep_seconds)
-            await asyncio.sleep(SETTINGS.cycle_sleep_seconds)
+            # дожидаемся, пока дедупликация разберёт хвост канала
+            await channel.join()
+            # канал пуст, индекс можно чистить и сохранять без гонок с дедупликацией
+            await asyncio.to_thread(evict_index)
+            await asyncio.to_thread(retrain_index)
+            if detector.snapshot_dirty and time.monotonic() - last_snapshot >= SETTINGS.index_snapshot_interval_seconds:
+                await asyncio.to_thread(detector.save_snapshot, SETTINGS.index_snapshot_dir)
+                last_snapshot = time.monotonic()
+            json_log(logger, 'cycle_complete', next_due=scheduler.next_due(), index_size=detector.index.ntotal)
     finally:
+        migration_task.cancel()
+        dedup_task.cancel()
+        if detector.snapshot_dirty:
+            try:
+                detector.save_snapshot(SETTINGS.index_snapshot_dir)
+            except Exception as exc:
+                json_log(logger, 'faiss_snapshot_save_error', error=str(exc))
         publisher_task.cancel()
+        executor.shutdown()
+        await browser_manager.close()
+        if fast_path is not None:
+            await fast_path.close()
+        if llm_client is not None:
+            await llm_client.close()
         await bot.session.close()
+        if llm_cache is not None:
+            llm_cache.close()
+        storage.close()
 
 
 if __name__ == '__main__':
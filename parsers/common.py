@@ -1,11 +1,88 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import random
 import time
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
 from typing import TypeVar
 
+from playwright.async_api import Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from logging_utils import json_log
+
 T = TypeVar('T')
 
+BLOCK_PATTERNS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ('captcha', ('smartcaptcha', 'captcha', 'капча', 'вы не робот', 'подтвердите, что запросы отправляли вы')),
+    ('access_denied', ('доступ временно ограничен', 'доступ запрещен', 'доступ запрещён', 'access denied')),
+    ('ddos_protection', ('ddos-guard', 'checking your browser', 'проверка браузера', 'just a moment')),
+)
+
+BLOCK_STATUSES = {403: 'forbidden', 429: 'rate_limited', 503: 'unavailable'}
+
+_VISIBLE_TEXT_SCRIPT = """() => document.title + '\\n' + (document.body ? document.body.innerText.slice(0, 3000) : '')"""
+
+
+class BlockedError(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class ListingPage:
+    # ссылки в порядке ленты, от новых к старым
+    links: list[str] = field(default_factory=list)
+    next_url: str | None = None
+    error: str | None = None
+
+
+_NEXT_PAGE_SCRIPT = """() => {
+    const selectors = [
+        'link[rel="next"]',
+        'a[rel="next"]',
+        '.pagination a.next',
+        '.nav-links a.next',
+        'a.next.page-numbers',
+        '[class*="pagination"] [class*="next"] a',
+        'a[class*="pagination"][class*="next"]',
+    ];
+    for (const selector of selectors) {
+        const el = document.querySelector(selector);
+        if (el && el.href && el.href !== location.href) return el.href;
+    }
+    return null;
+}"""
+
+
+async def find_next_page(page: Page) -> str | None:
+    try:
+        return await page.evaluate(_NEXT_PAGE_SCRIPT)
+    except Exception:
+        return None
+
+
+def classify_block(text: str) -> str | None:
+    lower = text.lower()
+    for reason, markers in BLOCK_PATTERNS:
+        if any(marker in lower for marker in markers):
+            return reason
+    return None
+
+
+async def open_page(page: Page, url: str, timeout: int) -> None:
+    response = await page.goto(url, timeout=timeout, wait_until='domcontentloaded')
+    if response is not None and response.status in BLOCK_STATUSES:
+        raise BlockedError(f'{BLOCK_STATUSES[response.status]} ({response.status}) {url}')
+
+
+async def check_blocked(page: Page) -> None:
+    # смотрим только видимый текст: слово captcha в скриптах обычной страницы не считается
+    reason = classify_block(await page.evaluate(_VISIBLE_TEXT_SCRIPT))
+    if reason is not None:
+        raise BlockedError(f'{reason} {page.url}')
+
 
 def safe_decode(text: str | None) -> str | None:
     if not text:
@@ -16,16 +93,149 @@ def safe_decode(text: str | None) -> str | None:
         return text
 
 
-def with_retry(func: Callable[[], T], retries: int = 3, delay_seconds: int = 2) -> T:
+async def with_retry(func: Callable[[], Awaitable[T]], retries: int = 3, delay_seconds: float = 2) -> T:
     last_error: Exception | None = None
     for attempt in range(1, retries + 1):
         try:
-            return func()
+            return await func()
         except Exception as exc:
             last_error = exc
-            if attempt == retries:
+            if isinstance(exc, BlockedError) or attempt == retries:
                 break
-            time.sleep(delay_seconds)
+            await asyncio.sleep(delay_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
     if last_error is None:
         raise RuntimeError('Неизвестная ошибка retry')
     raise last_error
+
+
+@dataclass(frozen=True, slots=True)
+class WaitStrategy:
+    # (css-селектор, минимальное число элементов) — все условия должны выполниться
+    ready: tuple[tuple[str, int], ...] = ()
+    network_idle: bool = False
+    timeout_ms: int = 10000
+    network_idle_timeout_ms: int = 3000
+
+
+_READY_SCRIPT = """(conditions) => conditions.every(
+    ([selector, count]) => document.querySelectorAll(selector).length >= count
+)"""
+
+_COUNT_SCRIPT = """([selector, previous]) => document.querySelectorAll(selector).length > previous"""
+
+
+async def wait_ready(page: Page, strategy: WaitStrategy) -> bool:
+    ready = True
+    if strategy.ready:
+        try:
+            await page.wait_for_function(
+                _READY_SCRIPT,
+                arg=[list(condition) for condition in strategy.ready],
+                timeout=strategy.timeout_ms,
+            )
+        except PlaywrightTimeoutError:
+            ready = False
+    if strategy.network_idle:
+        try:
+            await page.wait_for_load_state('networkidle', timeout=strategy.network_idle_timeout_ms)
+        except PlaywrightTimeoutError:
+            pass
+    return ready
+
+
+async def ensure_ready(page: Page, strategy: WaitStrategy) -> None:
+    # страница блокировки обычно и есть причина, по которой нужных элементов нет
+    if not await wait_ready(page, strategy):
+        await check_blocked(page)
+
+
+async def scroll_until(
+    page: Page,
+    selector: str,
+    target_count: int,
+    max_rounds: int = 10,
+    step_px: int = 2200,
+    round_timeout_ms: int = 1500,
+) -> int:
+    count = await page.locator(selector).count()
+    for _ in range(max_rounds):
+        if count >= target_count:
+            break
+        await page.mouse.wheel(0, step_px)
+        try:
+            await page.wait_for_function(_COUNT_SCRIPT, arg=[selector, count], timeout=round_timeout_ms)
+        except PlaywrightTimeoutError:
+            # лента больше не догружается
+            break
+        count = await page.locator(selector).count()
+    return count
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        logger: logging.Logger,
+        failure_threshold: int,
+        base_cooldown_seconds: float,
+        max_cooldown_seconds: float,
+        jitter: float = 0.2,
+    ):
+        self.name = name
+        self.logger = logger
+        self.failure_threshold = failure_threshold
+        self.base_cooldown_seconds = base_cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.jitter = jitter
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_count = 0
+        self.open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow(self) -> bool:
+        if self.state != self.OPEN:
+            return True
+        if time.time() < self.open_until:
+            return False
+        # один пробный проход: успех закроет цепь, неудача откроет её на удвоенный срок
+        self.state = self.HALF_OPEN
+        json_log(self.logger, 'circuit_half_open', source=self.name)
+        return True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            json_log(self.logger, 'circuit_closed', source=self.name)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_count = 0
+
+    def record_failure(self, reason: str, blocked: bool = False) -> None:
+        if self.state == self.OPEN:
+            return
+        self.failures += 1
+        if blocked or self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open(reason)
+
+    def _open(self, reason: str) -> None:
+        self.open_count += 1
+        cooldown = min(self.max_cooldown_seconds, self.base_cooldown_seconds * 2 ** (self.open_count - 1))
+        cooldown *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.state = self.OPEN
+        self.failures = 0
+        self.open_until = time.time() + cooldown
+        json_log(
+            self.logger,
+            'circuit_open',
+            source=self.name,
+            reason=reason,
+            open_count=self.open_count,
+            cooldown_seconds=round(cooldown),
+        )
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+
+from playwright.async_api import Page
+
+from parsers.common import safe_decode
+
+
+@dataclass(frozen=True, slots=True)
+class LeadRules:
+    selector: str = 'p'
+    # границы длины строгие, как в прежних проверках len(text) > N
+    min_length: int = 30
+    max_length: int | None = None
+    stop_words: tuple[str, ...] = ()
+    skip_prefixes: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ExtractionRules:
+    title_selectors: tuple[str, ...] = ('h1',)
+    lead: LeadRules = LeadRules()
+    image_selectors: tuple[str, ...] = ("meta[property='og:image']", 'img')
+    # заголовки служебных страниц, которые не являются новостью
+    title_reject: tuple[str, ...] = ()
+
+    def rejects_title(self, title: str | None) -> bool:
+        return bool(title) and any(marker in title.lower() for marker in self.title_reject)
+
+    def accepts_lead(self, text: str) -> bool:
+        lead = self.lead
+        if len(text) <= lead.min_length:
+            return False
+        if lead.max_length is not None and len(text) >= lead.max_length:
+            return False
+        lower = text.lower()
+        if any(word in lower for word in lead.stop_words):
+            return False
+        return not any(text.startswith(prefix) for prefix in lead.skip_prefixes)
+
+
+_EXTRACT_SCRIPT = """(rules) => {
+    let title = '';
+    for (const selector of rules.title_selectors) {
+        const el = document.querySelector(selector);
+        if (el && el.innerText.trim()) {
+            title = el.innerText.trim();
+            break;
+        }
+    }
+
+    const leadRules = rules.lead;
+    let lead = '';
+    for (const p of document.querySelectorAll(leadRules.selector)) {
+        const text = (p.innerText || '').trim();
+        if (text.length <= leadRules.min_length) continue;
+        if (leadRules.max_length !== null && text.length >= leadRules.max_length) continue;
+        const lower = text.toLowerCase();
+        if (leadRules.stop_words.some(word => lower.includes(word))) continue;
+        if (leadRules.skip_prefixes.some(prefix => text.startsWith(prefix))) continue;
+        lead = text;
+        break;
+    }
+
+    let image = '';
+    for (const selector of rules.image_selectors) {
+        const el = document.querySelector(selector);
+        if (!el) continue;
+        const value = el.tagName === 'META'
+            ? el.getAttribute('content')
+            : (el.currentSrc || el.src || el.getAttribute('src'));
+        if (value) {
+            image = value;
+            break;
+        }
+    }
+    return [title, lead, image];
+}"""
+
+
+async def extract_article(page: Page, rules: ExtractionRules) -> tuple[str | None, str | None, str | None]:
+    title, lead, image_url = await page.evaluate(_EXTRACT_SCRIPT, asdict(rules))
+    if rules.rejects_title(title):
+        return None, None, None
+    return safe_decode(title), safe_decode(lead), image_url or None
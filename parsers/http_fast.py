@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+from collections import Counter, defaultdict
+from urllib.parse import urljoin
+
+import aiohttp
+from selectolax.parser import HTMLParser, Node
+
+from logging_utils import json_log
+from parsers.common import classify_block, safe_decode
+from parsers.extract import ExtractionRules
+
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9',
+}
+
+ArticleResult = tuple[str | None, str | None, str | None]
+
+
+class HttpFastPath:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        timeout_seconds: float,
+        max_connections: int,
+        connections_per_host: int,
+    ):
+        self.logger = logger
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.connections_per_host = connections_per_host
+        self._session: aiohttp.ClientSession | None = None
+        # source -> {'hit': n, 'blocked': n, ...}
+        self._stats: defaultdict[str, Counter[str]] = defaultdict(Counter)
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.connections_per_host,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            headers=HTTP_HEADERS,
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_article(self, source: str, url: str, rules: ExtractionRules) -> ArticleResult | None:
+        # None — быстрый путь не справился, нужен браузер
+        if self._session is None:
+            return None
+        outcome, result = await self._fetch(url, rules)
+        self._stats[source][outcome] += 1
+        if outcome != 'hit':
+            json_log(self.logger, 'fast_path_fallback', source=source, url=url, reason=outcome)
+        return result
+
+    async def _fetch(self, url: str, rules: ExtractionRules) -> tuple[str, ArticleResult | None]:
+        assert self._session is not None
+        try:
+            async with self._session.get(url, allow_redirects=True) as response:
+                if response.status in (403, 429, 503):
+                    return 'blocked', None
+                if response.status != 200:
+                    return 'http_error', None
+                html = await response.text(errors='replace')
+        except Exception as exc:
+            json_log(self.logger, 'fast_path_exception', url=url, error=str(exc))
+            return 'exception', None
+
+        # как и в браузере, смотрим только видимый текст: виджет капчи в форме комментариев не блокировка
+        if classify_block(visible_text(html)) is not None:
+            return 'blocked', None
+        title, lead, image_url = extract_from_html(html, url, rules)
+        if rules.rejects_title(title):
+            return 'hit', (None, None, None)
+        if not title or not lead:
+            return 'incomplete', None
+        return 'hit', (safe_decode(title), safe_decode(lead), image_url or None)
+
+    def report(self, source: str) -> None:
+        stats = self._stats[source]
+        attempts = sum(stats.values())
+        json_log(
+            self.logger,
+            'fast_path_stats',
+            source=source,
+            attempts=attempts,
+            hit_rate=round(stats['hit'] / attempts, 3) if attempts else None,
+            outcomes=dict(stats),
+        )
+
+
+def _node_text(node: Node) -> str:
+    return ' '.join(node.text(deep=True).split())
+
+
+def _meta_content(tree: HTMLParser, name: str) -> str:
+    node = tree.css_first(f'meta[property="{name}"]') or tree.css_first(f'meta[name="{name}"]')
+    return (node.attributes.get('content') or '').strip() if node else ''
+
+
+def visible_text(html: str, limit: int = 3000) -> str:
+    # серверный аналог _VISIBLE_TEXT_SCRIPT: заголовок и текст body без скриптов и стилей
+    tree = HTMLParser(html)
+    title = tree.css_first('title')
+    tree.strip_tags(['script', 'style', 'noscript', 'template'])
+    body = tree.body.text(separator=' ', strip=True) if tree.body is not None else ''
+    return (title.text(strip=True) if title is not None else '') + '\n' + body[:limit]
+
+
+def extract_from_html(html: str, url: str, rules: ExtractionRules) -> tuple[str, str, str]:
+    # серверный аналог _EXTRACT_SCRIPT; при пустом h1/абзаце берёт og:title/og:description
+    tree = HTMLParser(html)
+    title = ''
+    for selector in rules.title_selectors:
+        node = tree.css_first(selector)
+        if node is not None and _node_text(node):
+            title = _node_text(node)
+            break
+    title = title or _meta_content(tree, 'og:title')
+
+    lead = ''
+    for node in tree.css(rules.lead.selector):
+        text = _node_text(node)
+        if rules.accepts_lead(text):
+            lead = text
+            break
+    if not lead:
+        description = _meta_content(tree, 'og:description')
+        if rules.accepts_lead(description):
+            lead = description
+
+    image_url = ''
+    for selector in rules.image_selectors:
+        node = tree.css_first(selector)
+        if node is None:
+            continue
+        value = node.attributes.get('content' if node.tag == 'meta' else 'src') or ''
+        if value:
+            image_url = urljoin(url, value.strip())
+            break
+    return title, lead, image_url
@@ -1,24 +1,70 @@
 from __future__ import annotations
 
 import logging
-import time
-from playwright.sync_api import Page
+from playwright.async_api import Page
 
 from logging_utils import json_log
-from parsers.common import safe_decode, with_retry
+from parsers.common import (
+    BlockedError,
+    ListingPage,
+    WaitStrategy,
+    ensure_ready,
+    find_next_page,
+    open_page,
+    scroll_until,
+    with_retry,
+)
+from parsers.extract import ExtractionRules, LeadRules, extract_article
 
+KOLESA_NEWS_URL = 'https://www.kolesa.ru/news'
+AUTOSTAT_NEWS_URL = 'https://www.autostat.ru/news/'
+AVTONOVOSTIDNYA_NEWS_URL = 'https://avtonovostidnya.ru/'
+AUTO_RU_NEWS_URL = 'https://auto.ru/mag/theme/news/'
+# у auto.ru нет страниц ленты, глубина задаётся числом ссылок при прокрутке
+AUTO_RU_SCROLL_TARGET = 40
 
-def parse_kolesa_ru(page: Page, logger: logging.Logger) -> list[str]:
-    json_log(logger, 'site_start', site='kolesa.ru')
+KOLESA_LISTING_WAIT = WaitStrategy(ready=(("a[href*='/news/']", 5),))
+KOLESA_ARTICLE_WAIT = WaitStrategy(ready=(('h1', 1), ('p', 3)))
+AUTOSTAT_LISTING_WAIT = WaitStrategy(ready=(('a[href^="/news/"]', 5),), timeout_ms=15000)
+AUTOSTAT_ARTICLE_WAIT = WaitStrategy(ready=(('h1', 1), ('p', 3)))
+AVTONOVOSTIDNYA_LISTING_WAIT = WaitStrategy(ready=(('article h2 a, article h3 a', 5),))
+AVTONOVOSTIDNYA_ARTICLE_WAIT = WaitStrategy(ready=(('h1, .entry-title', 1), ('.entry-content p, .post-content p, article p', 1)))
+AUTO_RU_LISTING_WAIT = WaitStrategy(ready=(('a[href*="/mag/article/"], #confirm-button', 1),), timeout_ms=15000)
+AUTO_RU_ARTICLE_WAIT = WaitStrategy(ready=(('h1', 1), ('p', 3)))
+AUTO_RU_ARTICLE_LINKS = 'a[href*="/mag/article/"]'
+
+KOLESA_ARTICLE_RULES = ExtractionRules()
+AUTOSTAT_ARTICLE_RULES = ExtractionRules(
+    lead=LeadRules(
+        min_length=50,
+        max_length=500,
+        stop_words=('e-mail', 'регистрация', 'нажмите', 'подпис', 'источник'),
+    ),
+)
+AVTONOVOSTIDNYA_ARTICLE_RULES = ExtractionRules(
+    title_selectors=('h1', '.entry-title'),
+    lead=LeadRules(selector='.entry-content p, .post-content p, article p'),
+    image_selectors=('meta[property="og:image"]', '.wp-post-image, img, article img'),
+)
+AUTO_RU_ARTICLE_RULES = ExtractionRules(
+    lead=LeadRules(min_length=100, stop_words=('фото', 'источник'), skip_prefixes=('Читайте',)),
+    image_selectors=("meta[property='og:image']",),
+    title_reject=('главное за день',),
+)
+
+
+async def parse_kolesa_ru(page: Page, logger: logging.Logger, url: str | None = None) -> ListingPage:
+    url = url or KOLESA_NEWS_URL
+    json_log(logger, 'site_start', site='kolesa.ru', url=url)
     try:
-        def _work() -> list[str]:
-            page.set_extra_http_headers({
+        async def _work() -> ListingPage:
+            await page.set_extra_http_headers({
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
                 'Accept-Language': 'ru-RU,ru;q=0.9',
             })
-            page.goto('https://www.kolesa.ru/news', timeout=40000, wait_until='domcontentloaded')
-            time.sleep(3)
-            return page.evaluate("""() => {
+            await open_page(page, url, timeout=40000)
+            await ensure_ready(page, KOLESA_LISTING_WAIT)
+            links = await page.evaluate("""() => {
                 const links = new Set();
                 const xpathResult = document.evaluate(
                     "//a[contains(@href, '/news/') and not(contains(@href, '/news/archive/'))]",
@@ -27,173 +73,144 @@ def parse_kolesa_ru(page: Page, logger: logging.Logger) -> list[str]:
                     XPathResult.ORDERED_NODE_SNAPSHOT_TYPE,
                     null
                 );
-                for (let i = 0; i < Math.min(xpathResult.snapshotLength, 15); i++) {
+                for (let i = 0; i < xpathResult.snapshotLength; i++) {
                     const link = xpathResult.snapshotItem(i);
                     if (link.textContent.trim().length > 10) {
                         links.add(link.href.startsWith('http') ? link.href : 'https://www.kolesa.ru' + link.href);
                     }
                 }
                 return Array.from(links);
-            }""")[:5]
-        links = with_retry(_work)
-        json_log(logger, 'site_links_found', site='kolesa.ru', count=len(links))
-        return links
+            }""")
+            return ListingPage(links, await find_next_page(page))
+        listing = await with_retry(_work)
+        json_log(logger, 'site_links_found', site='kolesa.ru', count=len(listing.links))
+        return listing
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'site_error', site='kolesa.ru', error=str(exc))
-        return []
+        return ListingPage(error=str(exc))
 
 
-def parse_kolesa_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
+async def parse_kolesa_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
     try:
-        def _work() -> tuple[str | None, str | None, str | None]:
-            page.goto(url, timeout=30000, wait_until='domcontentloaded')
-            time.sleep(3)
-            title = page.locator('h1').first.inner_text(timeout=5000)
-            lead = ''
-            paragraphs = page.locator('p')
-            for i in range(paragraphs.count()):
-                try:
-                    text = paragraphs.nth(i).inner_text(timeout=1000).strip()
-                    if len(text) > 30:
-                        lead = text
-                        break
-                except Exception:
-                    continue
-            image_url = page.locator("meta[property='og:image']").get_attribute('content')
-            if not image_url:
-                image_url = page.locator('img').first.get_attribute('src')
-            return safe_decode(title), safe_decode(lead), image_url
-        return with_retry(_work)
+        async def _work() -> tuple[str | None, str | None, str | None]:
+            await open_page(page, url, timeout=30000)
+            await ensure_ready(page, KOLESA_ARTICLE_WAIT)
+            return await extract_article(page, KOLESA_ARTICLE_RULES)
+        return await with_retry(_work)
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'article_error', site='kolesa.ru', url=url, error=str(exc))
         return None, None, None
 
 
-def parse_autostat_ru(page: Page, logger: logging.Logger) -> list[str]:
-    json_log(logger, 'site_start', site='autostat.ru')
+async def parse_autostat_ru(page: Page, logger: logging.Logger, url: str | None = None) -> ListingPage:
+    url = url or AUTOSTAT_NEWS_URL
+    json_log(logger, 'site_start', site='autostat.ru', url=url)
     try:
-        def _work() -> list[str]:
-            page.goto('https://www.autostat.ru/news/', timeout=60000, wait_until='domcontentloaded')
-            time.sleep(5)
-            return page.evaluate("""() => {
+        async def _work() -> ListingPage:
+            await open_page(page, url, timeout=60000)
+            await ensure_ready(page, AUTOSTAT_LISTING_WAIT)
+            links = await page.evaluate("""() => {
                 const found = [];
                 document.querySelectorAll('a[href^="/news/"]').forEach(a => {
                     const href = a.getAttribute('href');
-                    if (/^\/news\/\d+\/$/.test(href)) {
-                        found.push('https://www.autostat.ru' + href);
+                    const url = 'https://www.autostat.ru' + href;
+                    if (/^\/news\/\d+\/$/.test(href) && !found.includes(url)) {
+                        found.push(url);
                     }
                 });
-                return found.slice(0, 5);
+                return found;
             }""")
-        links = with_retry(_work)
-        json_log(logger, 'site_links_found', site='autostat.ru', count=len(links))
-        return links
+            return ListingPage(links, await find_next_page(page))
+        listing = await with_retry(_work)
+        json_log(logger, 'site_links_found', site='autostat.ru', count=len(listing.links))
+        return listing
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'site_error', site='autostat.ru', error=str(exc))
-        return []
+        return ListingPage(error=str(exc))
 
 
-def parse_autostat_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
+async def parse_autostat_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
     try:
-        def _work() -> tuple[str | None, str | None, str | None]:
-            page.goto(url, timeout=30000, wait_until='domcontentloaded')
-            time.sleep(3)
-            title = page.locator('h1').first.inner_text(timeout=5000)
-            lead = ''
-            paragraphs = page.locator('p')
-            for i in range(paragraphs.count()):
-                try:
-                    text = paragraphs.nth(i).inner_text(timeout=1000).strip()
-                    if 50 < len(text) < 500 and all(x not in text.lower() for x in ['e-mail', 'регистрация', 'нажмите', 'подпис', 'источник']):
-                        lead = text
-                        break
-                except Exception:
-                    continue
-            image_url = page.locator("meta[property='og:image']").get_attribute('content')
-            if not image_url:
-                image_url = page.locator('img').first.get_attribute('src')
-            return safe_decode(title), safe_decode(lead), image_url
-        return with_retry(_work)
+        async def _work() -> tuple[str | None, str | None, str | None]:
+            await open_page(page, url, timeout=30000)
+            await ensure_ready(page, AUTOSTAT_ARTICLE_WAIT)
+            return await extract_article(page, AUTOSTAT_ARTICLE_RULES)
+        return await with_retry(_work)
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'article_error', site='autostat.ru', url=url, error=str(exc))
         return None, None, None
 
 
-def parse_avtonovostidnya_ru(page: Page, logger: logging.Logger) -> list[str]:
-    json_log(logger, 'site_start', site='avtonovostidnya.ru')
+async def parse_avtonovostidnya_ru(page: Page, logger: logging.Logger, url: str | None = None) -> ListingPage:
+    url = url or AVTONOVOSTIDNYA_NEWS_URL
+    json_log(logger, 'site_start', site='avtonovostidnya.ru', url=url)
     try:
-        def _work() -> list[str]:
-            page.goto('https://avtonovostidnya.ru/', timeout=30000, wait_until='domcontentloaded')
-            time.sleep(3)
-            return page.evaluate("""() => {
+        async def _work() -> ListingPage:
+            await open_page(page, url, timeout=30000)
+            await ensure_ready(page, AVTONOVOSTIDNYA_LISTING_WAIT)
+            links = await page.evaluate("""() => {
                 const items = Array.from(document.querySelectorAll('article'));
                 return items.map(item => {
                     const link = item.querySelector('h2 a, h3 a');
                     return link ? link.href : null;
-                }).filter(href => href && href.includes('avtonovostidnya.ru')).slice(0, 5);
+                }).filter(href => href && href.includes('avtonovostidnya.ru'));
             }""")
-        links = with_retry(_work)
-        json_log(logger, 'site_links_found', site='avtonovostidnya.ru', count=len(links))
-        return links
+            return ListingPage(links, await find_next_page(page))
+        listing = await with_retry(_work)
+        json_log(logger, 'site_links_found', site='avtonovostidnya.ru', count=len(listing.links))
+        return listing
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'site_error', site='avtonovostidnya.ru', error=str(exc))
-        return []
+        return ListingPage(error=str(exc))
 
 
-def parse_avtonovostidnya_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
+async def parse_avtonovostidnya_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
     try:
-        def _work() -> tuple[str | None, str | None, str | None]:
-            page.goto(url, timeout=30000, wait_until='domcontentloaded')
-            time.sleep(3)
-            title = page.evaluate("""() => {
-                let t = document.querySelector('h1') || document.querySelector('.entry-title');
-                return t ? t.innerText.trim() : '';
-            }""")
-            lead = page.evaluate("""() => {
-                let ps = Array.from(document.querySelectorAll('.entry-content p, .post-content p, article p'));
-                for (const p of ps) {
-                    let text = p.innerText.trim();
-                    if (text.length > 30) return text;
-                }
-                return '';
-            }""")
-            image_url = page.evaluate("""() => {
-                let img = document.querySelector('meta[property="og:image"]');
-                if (img && img.content) return img.content;
-                img = document.querySelector('.wp-post-image, img, article img');
-                return img && img.src ? img.src : '';
-            }""")
-            return safe_decode(title), safe_decode(lead), image_url
-        return with_retry(_work)
+        async def _work() -> tuple[str | None, str | None, str | None]:
+            await open_page(page, url, timeout=30000)
+            await ensure_ready(page, AVTONOVOSTIDNYA_ARTICLE_WAIT)
+            return await extract_article(page, AVTONOVOSTIDNYA_ARTICLE_RULES)
+        return await with_retry(_work)
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'article_error', site='avtonovostidnya.ru', url=url, error=str(exc))
         return None, None, None
 
 
-def parse_auto_ru(page: Page, logger: logging.Logger) -> list[str]:
-    json_log(logger, 'site_start', site='auto.ru')
+async def parse_auto_ru(page: Page, logger: logging.Logger, url: str | None = None) -> ListingPage:
+    url = url or AUTO_RU_NEWS_URL
+    json_log(logger, 'site_start', site='auto.ru', url=url)
     try:
-        def _work() -> list[str]:
-            page.set_extra_http_headers({
+        async def _work() -> ListingPage:
+            await page.set_extra_http_headers({
                 'Accept-Language': 'ru-RU,ru;q=0.9',
                 'Upgrade-Insecure-Requests': '1',
                 'Cache-Control': 'max-age=0',
             })
-            page.goto('https://auto.ru/mag/theme/news/', timeout=60000, wait_until='domcontentloaded')
-            time.sleep(2)
-            try:
-                page.click('#confirm-button', timeout=5000)
-                json_log(logger, 'auto_ru_confirm_clicked')
-                time.sleep(1)
-            except Exception:
-                pass
-            for _ in range(10):
-                page.mouse.wheel(0, 2200)
-                time.sleep(1.0)
-
-            html = page.content().lower()
-            if 'доступ временно ограничен' in html or 'робот' in html or 'captcha' in html:
-                json_log(logger, 'auto_ru_block_detected')
+            await open_page(page, url, timeout=60000)
+            await ensure_ready(page, AUTO_RU_LISTING_WAIT)
+            # после первого согласия cookie сохраняются в состоянии контекста и кнопки уже нет
+            confirm = page.locator('#confirm-button')
+            if await confirm.count():
+                try:
+                    await confirm.click(timeout=5000)
+                    json_log(logger, 'auto_ru_confirm_clicked')
+                    await page.wait_for_selector(AUTO_RU_ARTICLE_LINKS, state='attached', timeout=10000)
+                except Exception:
+                    pass
+            count = await scroll_until(page, AUTO_RU_ARTICLE_LINKS, target_count=AUTO_RU_SCROLL_TARGET, max_rounds=20)
+            json_log(logger, 'auto_ru_scroll_done', links=count)
 
             strategies = [
                 """() => Array.from(document.querySelectorAll('a'))
@@ -209,7 +226,7 @@ def parse_auto_ru(page: Page, logger: logging.Logger) -> list[str]:
             found: list[str] = []
             for i, script in enumerate(strategies, start=1):
                 try:
-                    current = page.evaluate(script)
+                    current = await page.evaluate(script)
                     json_log(logger, 'auto_ru_strategy_result', strategy=i, count=len(current))
                     found.extend(current)
                 except Exception as exc:
@@ -225,52 +242,28 @@ def parse_auto_ru(page: Page, logger: logging.Logger) -> list[str]:
                     continue
                 seen.add(link)
                 links.append(link)
-            return links[:5]
-        links = with_retry(_work)
-        json_log(logger, 'site_links_found', site='auto.ru', count=len(links))
-        return links
+            return ListingPage(links)
+        listing = await with_retry(_work)
+        json_log(logger, 'site_links_found', site='auto.ru', count=len(listing.links))
+        return listing
+    except BlockedError:
+        raise
     except Exception as exc:
         json_log(logger, 'site_error', site='auto.ru', error=str(exc))
-        return []
+        return ListingPage(error=str(exc))
 
 
-def parse_auto_article(page, url, logger):
+async def parse_auto_article(page: Page, url: str, logger: logging.Logger) -> tuple[str | None, str | None, str | None]:
     try:
-        page.goto(url, timeout=60000, wait_until='domcontentloaded')
-
-        # ждем заголовок
-        page.wait_for_selector("h1", timeout=10000)
-
-        title = page.locator("h1").first.inner_text()
+        await open_page(page, url, timeout=60000)
 
-        if title and "главное за день" in title.lower():
-            return None, None, None
+        # ждем заголовок и текст
+        await ensure_ready(page, AUTO_RU_ARTICLE_WAIT)
 
-        # получаем первый нормальный абзац
-        paragraphs = page.locator("p")
-        lead = ""
+        return await extract_article(page, AUTO_RU_ARTICLE_RULES)
 
-        for i in range(paragraphs.count()):
-            try:
-                text = paragraphs.nth(i).inner_text(timeout=1000).strip()
-
-                if (
-                    len(text) > 100
-                    and "фото" not in text.lower()
-                    and "источник" not in text.lower()
-                    and not text.startswith("Читайте")
-                ):
-                    lead = text
-                    break
-            except:
-                continue
-
-        # картинка
-        image = page.locator("meta[property='og:image']")
-        image_url = image.get_attribute("content") if image else ""
-
-        return title, lead, image_url
-
-    except Exception as e:
-        log(f"❌ auto.ru ошибка: {e}")
-        return None, None, None
\ No newline at end of file
+    except BlockedError:
+        raise
+    except Exception as exc:
+        json_log(logger, 'article_error', site='auto.ru', url=url, error=str(exc))
+        return None, None, None
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from playwright.async_api import Page
+
+from blocking import DEFAULT_BLOCKED_TYPES, BlockingRules
+from parsers.common import ListingPage
+from parsers.extract import ExtractionRules
+from parsers.sites import (
+    AUTOSTAT_ARTICLE_RULES,
+    AVTONOVOSTIDNYA_ARTICLE_RULES,
+    KOLESA_ARTICLE_RULES,
+    parse_auto_article,
+    parse_auto_ru,
+    parse_autostat_article,
+    parse_autostat_ru,
+    parse_avtonovostidnya_article,
+    parse_avtonovostidnya_ru,
+    parse_kolesa_article,
+    parse_kolesa_ru,
+)
+
+LinksParser = Callable[[Page, logging.Logger, str | None], Awaitable[ListingPage]]
+ArticleParser = Callable[[Page, str, logging.Logger], Awaitable[tuple[str | None, str | None, str | None]]]
+
+
+@dataclass(frozen=True, slots=True)
+class Source:
+    name: str
+    links_parser: LinksParser
+    article_parser: ArticleParser
+    # None — взять общий лимит из настроек
+    max_concurrency: int | None = None
+    blocking: BlockingRules = BlockingRules()
+    # правила для извлечения статьи из HTML без браузера; None — только через Playwright
+    fast_path_rules: ExtractionRules | None = None
+
+
+SOURCES: tuple[Source, ...] = (
+    Source(
+        'auto.ru',
+        parse_auto_ru,
+        parse_auto_article,
+        max_concurrency=1,
+        # простые HTTP-запросы auto.ru почти всегда уводит на капчу, поэтому быстрого пути нет;
+        # лента догружается скриптами с CDN Яндекса
+        blocking=BlockingRules(
+            first_party_domains=('auto.ru',),
+            block_third_party=True,
+            allowed_domains=('yastatic.net', 'yandex.net', 'yandex.ru'),
+        ),
+    ),
+    Source(
+        'kolesa.ru',
+        parse_kolesa_ru,
+        parse_kolesa_article,
+        blocking=BlockingRules(
+            first_party_domains=('kolesa.ru',),
+            blocked_types=DEFAULT_BLOCKED_TYPES | {'stylesheet'},
+            block_third_party=True,
+        ),
+        fast_path_rules=KOLESA_ARTICLE_RULES,
+    ),
+    Source(
+        'autostat.ru',
+        parse_autostat_ru,
+        parse_autostat_article,
+        blocking=BlockingRules(
+            first_party_domains=('autostat.ru',),
+            blocked_types=DEFAULT_BLOCKED_TYPES | {'stylesheet'},
+            block_third_party=True,
+        ),
+        fast_path_rules=AUTOSTAT_ARTICLE_RULES,
+    ),
+    Source(
+        'avtonovostidnya.ru',
+        parse_avtonovostidnya_ru,
+        parse_avtonovostidnya_article,
+        blocking=BlockingRules(
+            first_party_domains=('avtonovostidnya.ru',),
+            blocked_types=DEFAULT_BLOCKED_TYPES | {'stylesheet'},
+            block_third_party=True,
+        ),
+        fast_path_rules=AVTONOVOSTIDNYA_ARTICLE_RULES,
+    ),
+)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from logging_utils import json_log
+
+
+@dataclass(slots=True)
+class SourceSchedule:
+    name: str
+    interval_seconds: float
+    next_due: float
+    # сглаженная скорость появления новых ссылок, штук в час
+    publish_rate: float | None = None
+    last_polled: float | None = None
+    empty_streak: int = 0
+    error_streak: int = 0
+
+
+class PollingScheduler:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        sources: Iterable[str],
+        initial_interval_seconds: float,
+        min_interval_seconds: float,
+        max_interval_seconds: float,
+        target_new_links: float,
+        smoothing: float = 0.3,
+        empty_backoff: float = 1.5,
+        error_backoff: float = 2.0,
+    ):
+        self.logger = logger
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.target_new_links = target_new_links
+        self.smoothing = smoothing
+        self.empty_backoff = empty_backoff
+        self.error_backoff = error_backoff
+        now = time.time()
+        # при старте опрашиваем все источники сразу
+        self._schedules = {
+            name: SourceSchedule(name, self._clamp(initial_interval_seconds), next_due=now)
+            for name in sources
+        }
+
+    def due(self, now: float | None = None) -> list[str]:
+        now = time.time() if now is None else now
+        return [name for name, schedule in self._schedules.items() if schedule.next_due <= now]
+
+    def seconds_until_next(self, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        return max(0.0, min(schedule.next_due for schedule in self._schedules.values()) - now)
+
+    def next_due(self) -> dict[str, str]:
+        return {
+            name: datetime.fromtimestamp(schedule.next_due).isoformat(timespec='seconds')
+            for name, schedule in self._schedules.items()
+        }
+
+    def record(self, name: str, new_links: int, error: str | None = None, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        schedule = self._schedules[name]
+
+        if error:
+            schedule.error_streak += 1
+            schedule.interval_seconds = self._clamp(schedule.interval_seconds * self.error_backoff)
+        else:
+            schedule.error_streak = 0
+            if schedule.last_polled is not None:
+                elapsed_hours = max((now - schedule.last_polled) / 3600, 1 / 60)
+                observed = new_links / elapsed_hours
+                if schedule.publish_rate is None:
+                    schedule.publish_rate = observed
+                else:
+                    schedule.publish_rate = self.smoothing * observed + (1 - self.smoothing) * schedule.publish_rate
+            if new_links:
+                schedule.empty_streak = 0
+                if schedule.publish_rate:
+                    # интервал, за который в среднем набирается target_new_links новостей
+                    schedule.interval_seconds = self._clamp(self.target_new_links / schedule.publish_rate * 3600)
+            else:
+                schedule.empty_streak += 1
+                schedule.interval_seconds = self._clamp(schedule.interval_seconds * self.empty_backoff)
+            schedule.last_polled = now
+
+        schedule.next_due = now + schedule.interval_seconds
+        json_log(
+            self.logger,
+            'source_schedule_updated',
+            source=name,
+            new_links=new_links,
+            error=error,
+            publish_rate_per_hour=round(schedule.publish_rate, 3) if schedule.publish_rate is not None else None,
+            interval_seconds=round(schedule.interval_seconds),
+            empty_streak=schedule.empty_streak,
+            error_streak=schedule.error_streak,
+            next_due=datetime.fromtimestamp(schedule.next_due).isoformat(timespec='seconds'),
+        )
+
+    def postpone(self, name: str, until: float) -> None:
+        schedule = self._schedules[name]
+        schedule.next_due = max(schedule.next_due, until)
+        json_log(
+            self.logger,
+            'source_schedule_postponed',
+            source=name,
+            next_due=datetime.fromtimestamp(schedule.next_due).isoformat(timespec='seconds'),
+        )
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval_seconds, max(self.min_interval_seconds, interval))
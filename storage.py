@@ -2,20 +2,79 @@ from __future__ import annotations
 
 import json
 import sqlite3
+import threading
+from collections import deque
+from collections.abc import Iterator, Sequence
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
+# держим число параметров запроса ниже SQLITE_MAX_VARIABLE_NUMBER старых сборок
+LINK_LOOKUP_BATCH = 500
+
+# embedding_format: NULL — старый JSON в колонке embedding, иначе код формата BLOB в embedding_blob
+EMBEDDING_FORMATS = {'float32': 1, 'float16': 2}
+EMBEDDING_DTYPES = {1: np.dtype('<f4'), 2: np.dtype('<f2')}
+
+# WAL: читатели не ждут писателя; synchronous=NORMAL в WAL теряет при сбое питания
+# только последние транзакции, но не портит базу
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-32000',
+    'mmap_size=268435456',
+    'busy_timeout=30000',
+)
+
+
+def encode_embedding(embedding: Sequence[float] | np.ndarray, fmt: int) -> bytes:
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPES[fmt]).tobytes()
+
+
+def decode_embedding(blob: bytes, fmt: int, dimension: int) -> np.ndarray:
+    vector = np.frombuffer(blob, dtype=EMBEDDING_DTYPES[fmt], count=dimension)
+    # float32 читается без копирования; float16 приходится расширять
+    return vector if vector.dtype == np.float32 else vector.astype(np.float32)
+
 
 class PublishedStorage:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, embedding_dtype: str = 'float32', recent_window: int = 10):
+        if embedding_dtype not in EMBEDDING_FORMATS:
+            raise ValueError(f'Неизвестный формат эмбеддингов: {embedding_dtype}')
         self.db_path = db_path
+        self.embedding_format = EMBEDDING_FORMATS[embedding_dtype]
+        # у каждого потока своё долгоживущее соединение; писатели идут по одному
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
         self._init_db()
+        # последние недублирующие статьи без эмбеддингов; add_article вызывается из потоков
+        self._recent_lock = threading.Lock()
+        self._recent: deque[dict[str, Any]] = deque(self._load_recent(recent_window), maxlen=recent_window)
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False только ради close() из главного потока
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in SQLITE_PRAGMAS:
+                conn.execute(f'PRAGMA {pragma}')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
         return conn
 
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
     def _init_db(self) -> None:
         with self._connect() as conn:
             conn.execute(
@@ -39,28 +98,42 @@ class PublishedStorage:
             conn.execute(
                 'CREATE INDEX IF NOT EXISTS idx_published_is_duplicate ON published_articles(is_duplicate)'
             )
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(published_articles)')}
+            for name, ddl in (
+                ('embedding_blob', 'BLOB'),
+                ('embedding_format', 'INTEGER'),
+                ('embedding_dim', 'INTEGER'),
+            ):
+                if name not in columns:
+                    conn.execute(f'ALTER TABLE published_articles ADD COLUMN {name} {ddl}')
             conn.commit()
 
     def load_all(self) -> list[dict[str, Any]]:
+        return self._load_rows('', ())
+
+    def _load_rows(self, where: str, params: Sequence[Any]) -> list[dict[str, Any]]:
         with self._connect() as conn:
             rows = conn.execute(
-                '''
-                SELECT link, title, lead, text, embedding, source, is_duplicate, created_at
+                f'''
+                SELECT id, link, title, lead, text, embedding, embedding_blob, embedding_format, embedding_dim,
+                       source, is_duplicate, created_at
                 FROM published_articles
+                {where}
                 ORDER BY id ASC
-                '''
+                ''',
+                params,
             ).fetchall()
 
         result: list[dict[str, Any]] = []
         for row in rows:
-            embedding_raw = row['embedding']
             result.append(
                 {
+                    'id': row['id'],
                     'link': row['link'],
                     'title': row['title'],
                     'lead': row['lead'],
                     'text': row['text'],
-                    'embedding': json.loads(embedding_raw) if embedding_raw else None,
+                    'embedding': self._row_embedding(row),
                     'source': row['source'],
                     'is_duplicate': bool(row['is_duplicate']),
                     'created_at': row['created_at'],
@@ -68,13 +141,142 @@ class PublishedStorage:
             )
         return result
 
-    def link_exists(self, link: str) -> bool:
+    def load_embeddings(self, after_id: int = 0, chunk_size: int = 10000) -> tuple[np.ndarray, np.ndarray]:
+        # только id и векторы, сразу в numpy; без словарей и текстов
+        id_chunks: list[np.ndarray] = []
+        vector_chunks: list[np.ndarray] = []
+        cursor = self._connect().execute(
+            '''
+            SELECT id, embedding, embedding_blob, embedding_format, embedding_dim
+            FROM published_articles
+            WHERE id > ? AND (embedding_blob IS NOT NULL OR embedding IS NOT NULL)
+            ORDER BY id ASC
+            ''',
+            (after_id,),
+        )
+        while rows := cursor.fetchmany(chunk_size):
+            id_chunks.append(np.fromiter((row['id'] for row in rows), dtype='int64', count=len(rows)))
+            vector_chunks.append(np.vstack([self._row_embedding(row) for row in rows]))
+        if not id_chunks:
+            return np.empty(0, dtype='int64'), np.empty((0, 0), dtype='float32')
+        return np.concatenate(id_chunks), np.concatenate(vector_chunks)
+
+    def iter_texts(self, after_id: int = 0, chunk_size: int = 10000) -> Iterator[tuple[int, str]]:
+        cursor = self._connect().execute(
+            'SELECT id, text FROM published_articles WHERE id > ? ORDER BY id ASC',
+            (after_id,),
+        )
+        while rows := cursor.fetchmany(chunk_size):
+            yield from ((row['id'], row['text']) for row in rows)
+
+    @staticmethod
+    def _row_embedding(row: sqlite3.Row) -> np.ndarray | None:
+        if row['embedding_format'] is not None:
+            return decode_embedding(row['embedding_blob'], row['embedding_format'], row['embedding_dim'])
+        if row['embedding']:
+            # строка ещё не перенесена migrate_embeddings
+            return np.asarray(json.loads(row['embedding']), dtype=np.float32)
+        return None
+
+    def migrate_embeddings(self, batch_size: int = 1000) -> int:
+        # переводит очередную пачку JSON-эмбеддингов в BLOB; 0 — переносить больше нечего
+        with self._write_lock, self._connect() as conn:
+            rows = conn.execute(
+                '''
+                SELECT id, embedding FROM published_articles
+                WHERE embedding_format IS NULL AND embedding IS NOT NULL
+                LIMIT ?
+                ''',
+                (batch_size,),
+            ).fetchall()
+            updates = []
+            for row in rows:
+                vector = json.loads(row['embedding'])
+                updates.append((encode_embedding(vector, self.embedding_format), self.embedding_format, len(vector), row['id']))
+            conn.executemany(
+                '''
+                UPDATE published_articles
+                SET embedding_blob = ?, embedding_format = ?, embedding_dim = ?, embedding = NULL
+                WHERE id = ?
+                ''',
+                updates,
+            )
+            conn.commit()
+        return len(updates)
+
+    def vacuum(self) -> None:
+        with self._connect() as conn:
+            conn.execute('VACUUM')
+
+    def recent_articles(self, limit: int | None = None) -> list[dict[str, Any]]:
+        # от старых к новым, как хвост load_all()
+        with self._recent_lock:
+            entries = list(self._recent)
+        return entries if limit is None else entries[-limit:]
+
+    def _load_recent(self, limit: int) -> list[dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                '''
+                SELECT id, link, title, lead, text, source, created_at
+                FROM published_articles
+                WHERE is_duplicate = 0
+                ORDER BY id DESC
+                LIMIT ?
+                ''',
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def first_id_since(self, max_age_seconds: int) -> int:
+        # id первой строки не старше max_age_seconds; если таких нет — следующий за последним id
+        row = self._connect().execute(
+            '''
+            SELECT COALESCE(
+                (SELECT MIN(id) FROM published_articles WHERE created_at >= datetime('now', ?)),
+                (SELECT IFNULL(MAX(id), 0) + 1 FROM published_articles)
+            ) AS id
+            ''',
+            (f'-{int(max_age_seconds)} seconds',),
+        ).fetchone()
+        return row['id']
+
+    def load_texts(self, ids: Sequence[int]) -> dict[int, tuple[str, str]]:
+        # id -> (link, text), без чтения эмбеддингов
+        result: dict[int, tuple[str, str]] = {}
+        unique_ids = list(dict.fromkeys(ids))
         with self._connect() as conn:
-            row = conn.execute(
-                'SELECT 1 FROM published_articles WHERE link = ? LIMIT 1',
-                (link,),
-            ).fetchone()
-        return row is not None
+            for start in range(0, len(unique_ids), LINK_LOOKUP_BATCH):
+                batch = unique_ids[start:start + LINK_LOOKUP_BATCH]
+                placeholders = ', '.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT id, link, text FROM published_articles WHERE id IN ({placeholders})',
+                    batch,
+                ).fetchall()
+                result.update((row['id'], (row['link'], row['text'])) for row in rows)
+        return result
+
+    def link_exists(self, link: str) -> bool:
+        return bool(self.links_exist([link]))
+
+    def links_exist(self, links: Sequence[str]) -> set[str]:
+        unique_links = list(dict.fromkeys(links))
+        known: set[str] = set()
+        conn = self._connect()
+        for start in range(0, len(unique_links), LINK_LOOKUP_BATCH):
+            batch = unique_links[start:start + LINK_LOOKUP_BATCH]
+            placeholders = ', '.join('?' * len(batch))
+            rows = conn.execute(
+                f'SELECT link FROM published_articles WHERE link IN ({placeholders})',
+                batch,
+            ).fetchall()
+            known.update(row['link'] for row in rows)
+        return known
+
+    def filter_new_links(self, links: Sequence[str]) -> list[str]:
+        unique_links = list(dict.fromkeys(links))
+        known = self.links_exist(unique_links)
+        return [link for link in unique_links if link not in known]
 
     def add_article(
         self,
@@ -83,18 +285,66 @@ class PublishedStorage:
         title: str,
         lead: str,
         text: str,
-        embedding: list[float] | None,
+        embedding: Sequence[float] | np.ndarray | None,
         source: str,
         is_duplicate: bool,
-    ) -> None:
-        embedding_json = json.dumps(embedding, ensure_ascii=False) if embedding is not None else None
-        with self._connect() as conn:
-            conn.execute(
-                '''
-                INSERT OR IGNORE INTO published_articles (
-                    link, title, lead, text, embedding, source, is_duplicate
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (link, title, lead, text, embedding_json, source, int(is_duplicate)),
-            )
-            conn.commit()
+    ) -> int | None:
+        return self.add_articles(
+            [
+                {
+                    'link': link,
+                    'title': title,
+                    'lead': lead,
+                    'text': text,
+                    'embedding': embedding,
+                    'source': source,
+                    'is_duplicate': is_duplicate,
+                }
+            ]
+        )[0]
+
+    def add_articles(self, articles: Sequence[dict[str, Any]]) -> list[int | None]:
+        # вся пачка — одна транзакция и один fsync; None — ссылка уже была в базе
+        row_ids: list[int | None] = []
+        with self._write_lock, self._connect() as conn:
+            for article in articles:
+                embedding = article['embedding']
+                blob, fmt, dimension = None, None, None
+                if embedding is not None:
+                    blob, fmt, dimension = encode_embedding(embedding, self.embedding_format), self.embedding_format, len(embedding)
+                cursor = conn.execute(
+                    '''
+                    INSERT OR IGNORE INTO published_articles (
+                        link, title, lead, text, embedding_blob, embedding_format, embedding_dim, source, is_duplicate
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (
+                        article['link'],
+                        article['title'],
+                        article['lead'],
+                        article['text'],
+                        blob,
+                        fmt,
+                        dimension,
+                        article['source'],
+                        int(article['is_duplicate']),
+                    ),
+                )
+                row_ids.append(cursor.lastrowid if cursor.rowcount else None)
+
+        with self._recent_lock:
+            for article, row_id in zip(articles, row_ids):
+                if row_id is None or article['is_duplicate']:
+                    continue
+                self._recent.append(
+                    {
+                        'id': row_id,
+                        'link': article['link'],
+                        'title': article['title'],
+                        'lead': article['lead'],
+                        'text': article['text'],
+                        'source': article['source'],
+                        'created_at': None,
+                    }
+                )
+        return row_ids
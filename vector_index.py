@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+
+from logging_utils import json_log
+
+BACKENDS = ('flat', 'hnsw', 'ivf')
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        dimension: int,
+        backend: str = 'flat',
+        hnsw_m: int = 32,
+        hnsw_ef_construction: int = 80,
+        hnsw_ef_search: int = 64,
+        ivf_nlist: int = 1024,
+        ivf_nprobe: int = 16,
+        ivf_train_factor: int = 39,
+        ivf_retrain_growth: float = 2.0,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f'Неизвестный тип индекса: {backend}')
+        self.logger = logger
+        self.dimension = dimension
+        self.backend = backend
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        # IVF обучаем, когда на каждый кластер набирается ivf_train_factor векторов,
+        # и переобучаем, когда история выросла в ivf_retrain_growth раз
+        self.ivf_train_factor = ivf_train_factor
+        self.ivf_retrain_growth = ivf_retrain_growth
+        self._trained_size = 0
+        self._index = self._new_index(trained=False)
+
+    @property
+    def ntotal(self) -> int:
+        return self._index.ntotal
+
+    @property
+    def kind(self) -> str:
+        if isinstance(self._index, faiss.IndexIVF):
+            return 'ivf'
+        # для IVF до обучения работает точный поиск
+        return 'flat' if self.backend == 'ivf' else self.backend
+
+    def build(self, vectors: np.ndarray) -> None:
+        vectors = _as_matrix(vectors, self.dimension)
+        started = time.perf_counter()
+        trained = self.backend == 'ivf' and len(vectors) >= self._ivf_train_min()
+        index = self._new_index(trained=trained)
+        if trained:
+            index.train(vectors)
+        self._trained_size = len(vectors) if trained else 0
+        if len(vectors):
+            index.add(vectors)
+        self._index = index
+        json_log(
+            self.logger,
+            'faiss_index_built',
+            backend=self.kind,
+            total=self.ntotal,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def add(self, vectors: np.ndarray) -> None:
+        # обучение IVF здесь не запускается: оно долгое, его вызывает владелец через rebuild(),
+        # когда needs_training(), а до тех пор векторы пишутся в текущий индекс
+        self._index.add(_as_matrix(vectors, self.dimension))
+
+    def rebuild(self) -> None:
+        # векторы берём из самого индекса, без повторного чтения базы
+        self.build(self.reconstruct_all())
+
+    def remove_prefix(self, count: int) -> None:
+        # окно всегда срезает самые старые позиции, оставшиеся сдвигаются к началу
+        if count <= 0:
+            return
+        started = time.perf_counter()
+        if isinstance(self._index, faiss.IndexIVF):
+            # remove_ids у IVF не перенумеровывает позиции: очищаем списки и дописываем хвост,
+            # обученный квантизатор остаётся
+            vectors = self.reconstruct_all()[count:]
+            self._index.reset()
+            self._index.add(vectors)
+        elif isinstance(self._index, faiss.IndexFlat):
+            self._index.remove_ids(faiss.IDSelectorRange(0, count))
+        else:
+            # HNSW не умеет remove_ids
+            self.build(self.reconstruct_all()[count:])
+        json_log(
+            self.logger,
+            'faiss_index_compacted',
+            backend=self.kind,
+            removed=count,
+            total=self.ntotal,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def reconstruct_all(self) -> np.ndarray:
+        if self.ntotal == 0:
+            return np.empty((0, self.dimension), dtype='float32')
+        if isinstance(self._index, faiss.IndexIVF):
+            self._index.make_direct_map()
+        return self._index.reconstruct_n(0, self.ntotal)
+
+    def save(self, path: Path) -> dict[str, Any]:
+        # пишем во временный файл и подменяем, чтобы оборванная запись не испортила снимок
+        tmp_path = path.with_name(path.name + '.tmp')
+        faiss.write_index(self._index, str(tmp_path))
+        os.replace(tmp_path, path)
+        return {
+            'backend': self.backend,
+            'kind': self.kind,
+            'dimension': self.dimension,
+            'ntotal': self.ntotal,
+            'trained_size': self._trained_size,
+        }
+
+    def load(self, path: Path, meta: dict[str, Any]) -> bool:
+        # False — снимок от другой конфигурации или повреждён, индекс нужно строить заново
+        if meta.get('backend') != self.backend or meta.get('dimension') != self.dimension:
+            return False
+        try:
+            index = faiss.read_index(str(path))
+        except Exception as exc:
+            json_log(self.logger, 'faiss_snapshot_read_error', path=str(path), error=str(exc))
+            return False
+        if index.d != self.dimension or index.ntotal != meta.get('ntotal'):
+            return False
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.ivf_nprobe
+        elif isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.hnsw_ef_search
+        self._index = index
+        self._trained_size = int(meta.get('trained_size') or 0)
+        return True
+
+    def search(self, queries: np.ndarray, k: int, min_score: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # позиции -1 — пустые слоты: кандидатов меньше k или они ниже min_score
+        queries = _as_matrix(queries, self.dimension)
+        if self.ntotal == 0 or k <= 0:
+            return (
+                np.full((len(queries), max(k, 0)), -np.inf, dtype='float32'),
+                np.full((len(queries), max(k, 0)), -1, dtype='int64'),
+            )
+        scores, positions = self._index.search(queries, min(k, self.ntotal))
+        if min_score is not None:
+            positions = np.where(scores >= min_score, positions, -1)
+        return scores, positions
+
+    def needs_training(self) -> bool:
+        if self.backend != 'ivf':
+            return False
+        if self._trained_size == 0:
+            return self.ntotal >= self._ivf_train_min()
+        return self.ntotal >= self._trained_size * self.ivf_retrain_growth
+
+    def _ivf_train_min(self) -> int:
+        return self.ivf_nlist * self.ivf_train_factor
+
+    def _new_index(self, trained: bool) -> faiss.Index:
+        if self.backend == 'hnsw':
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+            index.hnsw.efSearch = self.hnsw_ef_search
+            return index
+        if self.backend == 'ivf' and trained:
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+            index.nprobe = self.ivf_nprobe
+            return index
+        return faiss.IndexFlatIP(self.dimension)
+
+
+def _as_matrix(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    matrix = np.ascontiguousarray(vectors, dtype='float32')
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.size == 0:
+        return matrix.reshape(0, dimension)
+    return matrix
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    matrix = np.array(vectors, dtype='float32', copy=True)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms